@@ -4,10 +4,13 @@ import numpy as np
 import re
 import sys
 import os
-from scipy.stats import spearmanr
 from sklearn.linear_model import Ridge
 from sklearn.preprocessing import StandardScaler
 
+# Shared feature ranking from Ratio_model/src
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "Ratio_model"))
+from src.feature_ranking import spearman_correlations
+
 # --- 1. Suppress Warnings ---
 warnings.filterwarnings("ignore")
 
@@ -52,22 +55,12 @@ print(f"Data Loaded: {X_train.shape[0]} samples (Age 4 Uncensored)")
 print(f"Total numeric features available: {X_train.shape[1]}")
 
 # --- 5. Step A: Find the Top 25 Features (Feature Selection) ---
-correlations = []
-for col in X_train.columns:
-    try:
-        # Calculate correlation ignoring NaNs
-        # We ensure inputs are floats
-        x_col = X_train[col].astype(float)
-        coef, p = spearmanr(x_col, y_train)
-        
-        if not np.isnan(coef):
-            correlations.append((col, abs(coef), coef)) 
-    except Exception as e:
-        # print(f"Skipping {col}: {e}")
-        pass
+# Spearman of every metabolite with diff in one vectorized pass; undefined correlations (NaN) are dropped
+spearman = spearman_correlations(X_train, y_train).dropna(subset=["coef"])
 
 # Create DataFrame of correlations
-corr_df = pd.DataFrame(correlations, columns=["Metabolite", "Abs_Corr", "Real_Corr"])
+corr_df = pd.DataFrame({"Metabolite": spearman.index, "Abs_Corr": spearman["coef"].abs().values,
+                        "Real_Corr": spearman["coef"].values, "P_Value": spearman["p_value"].values})
 
 # Sort by Absolute Correlation
 top_25_df = corr_df.sort_values(by="Abs_Corr", ascending=False).head(25)
@@ -1,24 +1,45 @@
-import pandas as pd
-import MIPMLP
+import argparse
+import hashlib
+import json
+import multiprocessing
 import os
+import queue
+import resource
+import sys
+import time
+import traceback
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Union_tables_To_MIPMLP"))
+
+from feature_table import FeatureTable, sparse_files
 
 # === Settings ===
+# for_preprocess.csv, or the sparse for_preprocess.npz (+ sidecars) from preprocess_to_mipmlp.py
 input_path = "/home/pintokf/Projects/Microbium/Mouses/Union_tables_To_MIPMLP/for_preprocess.csv"
 output_dir = "/home/pintokf/Projects/Microbium/Mouses/MIPMLP_scripts/whole_metadata"
 
+# Taxonomy levels to produce (1 = kingdom ... 7 = species)
+LEVELS = [7, 6]
+
+# Extra arguments for MIPMLP.preprocess (taxonomy_level is set per level)
+MIPMLP_PARAMS = {
+    "taxnomy_group": "sub PCA",
+}
+
 # === Helper function for proper saving with ID ===
-def save_with_id(df_result, filename):
+def save_with_id(df_result, out_path):
     """
     Receives the MIPMLP result, ensures ID exists as a column, and saves it.
     """
     # 1. Handle case where a Tuple is returned (happens in some versions)
     if isinstance(df_result, tuple):
         df_result = df_result[0]
-    
+
     # 2. Reset index to turn the ID into a standard column
     #    (Otherwise to_csv with index=False would delete it)
     df_result = df_result.reset_index()
-    
+
     # 3. Ensure the column name is ID
     #    Usually after reset_index the column is named 'index' or as it was originally
     if 'index' in df_result.columns:
@@ -27,63 +48,192 @@ def save_with_id(df_result, filename):
         # If the first column is not ID, rename it to ID just to be safe
         df_result.rename(columns={df_result.columns[0]: 'ID'}, inplace=True)
 
-    # 4. Save
-    out_path = f"{output_dir}/{filename}"
-    df_result.to_csv(out_path, index=False)
-    print(f"✅ Saved to: {out_path}")
-    print(f"   Shape: {df_result.shape}")
-    print(f"   First column: {df_result.columns[0]}") # Final check
-
-# === Start of execution ===
-print(f"Loading data from: {input_path}")
-try:
-    # Loading - we keep the ID as index during the loading phase
-    # MIPMLP knows how to work when ID is the index
-    df = pd.read_csv(input_path)
-    print(f"Data loaded. Shape: {df.shape}")
-    
-except Exception as e:
-    print(f"Error loading file: {e}")
-    exit(1)
-
-# ==========================================
-# Run 1: Level 7 (Species)
-# ==========================================
-print("\n--- Processing Level 7 (Species) ---")
-try:
-    processed_L7 = MIPMLP.preprocess(
-        df,
-        taxonomy_level=7,
-        taxnomy_group='sub PCA',      # Note: 'mean' was selected in your code   
-        )
-    
-    # Use the corrected function for saving
-    save_with_id(processed_L7, "processed_subpca_level7.csv")
-
-except Exception as e:
-    print(f"❌ Error in Level 7: {e}")
-    import traceback
-    traceback.print_exc()
-
-# ==========================================
-# Run 2: Level 6 (Genus)
-# ==========================================
-print("\n--- Processing Level 6 (Genus) ---")
-try:
-    processed_L6 = MIPMLP.preprocess(
-        df,
-        taxonomy_level=6,
-        taxnomy_group='sub PCA',      # Note: 'mean' was selected in your code
-    )
-
-    # Use the corrected function for saving
-    save_with_id(processed_L6, "processed_subpca_level6.csv")
-
-except Exception as e:
-    print(f"❌ Error in Level 6: {e}")
-    import traceback
-    traceback.print_exc()
-
-print("\nDone.")
-
-#python /home/pintokf/Projects/Microbium/Mouses/MIPMLP_scripts/run_mipmlp_preprocessing.py
\ No newline at end of file
+    # 4. Save (atomically, so a killed run never leaves a half-written level behind)
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    df_result.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, out_path)
+    return df_result.shape
+
+def output_path(level, params):
+    # e.g. processed_subpca_level7.csv for taxnomy_group='sub PCA'
+    group = params.get("taxnomy_group", "default").replace(" ", "").lower()
+    return os.path.join(output_dir, f"processed_{group}_level{level}.csv")
+
+def input_files(path):
+    # A sparse table is the .npz plus its row/column sidecars
+    return sparse_files(path) if path.endswith(".npz") else (path,)
+
+def input_hash(path):
+    h = hashlib.sha1()
+    for file_path in input_files(path):
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+def load_input(path):
+    """
+    A CSV is parsed into the DataFrame MIPMLP takes; a .npz stays a sparse
+    FeatureTable, sent as is to the workers and made dense only in
+    preprocess_level.
+    """
+    if path.endswith(".npz"):
+        return FeatureTable.load_npz(path)
+    # We keep the ID as a column, MIPMLP handles it
+    return pd.read_csv(path)
+
+def level_key(table_hash, level, params, mipmlp_version):
+    payload = json.dumps({"input": table_hash, "level": level, "params": params, "mipmlp": mipmlp_version},
+                         sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+def is_up_to_date(out_path, key):
+    # The .meta.json sidecar records the key the output was produced with
+    meta_path = out_path + ".meta.json"
+    if not (os.path.exists(out_path) and os.path.exists(meta_path)):
+        return False
+    try:
+        with open(meta_path) as f:
+            return json.load(f).get("key") == key
+    except (OSError, ValueError):
+        return False
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def preprocess_level(table, level, params, out_path, key):
+    """
+    Runs MIPMLP.preprocess for one taxonomy level in its own worker process.
+    table is a DataFrame or a sparse FeatureTable (see load_input).
+    Returns (level, shape, seconds, peak RSS MB, RSS growth MB, error or None).
+    """
+    import MIPMLP
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    try:
+        df = table.to_mipmlp_frame() if isinstance(table, FeatureTable) else table
+        processed = MIPMLP.preprocess(df, taxonomy_level=level, **params)
+        shape = save_with_id(processed, out_path)
+    except Exception:
+        return level, None, time.perf_counter() - start, peak_rss_mb(), peak_rss_mb() - baseline, traceback.format_exc()
+
+    seconds = time.perf_counter() - start
+    peak = peak_rss_mb()
+    with open(out_path + ".meta.json", "w") as f:
+        json.dump({"key": key, "level": level, "params": params, "seconds": round(seconds, 2),
+                   "peak_rss_mb": round(peak, 1)}, f, indent=2)
+    return level, shape, seconds, peak, peak - baseline, None
+
+def _level_process(results, worker, *args):
+    results.put(worker(*args))
+
+def _failed(level, started, message):
+    return level, None, time.perf_counter() - started, float("nan"), float("nan"), message
+
+def run_levels(table, todo, n_jobs, worker=preprocess_level):
+    """
+    Runs worker (preprocess_level) for every (level, out_path, key) in todo,
+    each in a new spawn process (so each level's peak RSS is its own), at most
+    n_jobs at a time. Yields the results as they finish; a process that ends
+    without sending a result (killed for memory, or exiting early, even with
+    code 0) is reported as an error for its level.
+    Plain multiprocessing.Process rather than ProcessPoolExecutor, whose
+    max_tasks_per_child needs Python 3.11.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    pending = list(todo)
+    running = {}
+    while pending or running:
+        while pending and len(running) < n_jobs:
+            level, out_path, key = pending.pop(0)
+            process = context.Process(target=_level_process,
+                                      args=(results, worker, table, level, MIPMLP_PARAMS, out_path, key))
+            process.start()
+            running[level] = (process, time.perf_counter())
+
+        finished = []
+        try:
+            finished.append(results.get(timeout=1))
+        except queue.Empty:
+            exited = [level for level, (process, _) in running.items() if process.exitcode is not None]
+            if not exited:
+                continue
+            # A result sent right before the exit may still be in the pipe
+            while True:
+                try:
+                    finished.append(results.get(timeout=0.1))
+                except queue.Empty:
+                    break
+            received = {result[0] for result in finished}
+            for level in exited:
+                if level not in received:
+                    process, started = running.pop(level)
+                    process.join()
+                    yield _failed(level, started, f"Worker process exited with code {process.exitcode} "
+                                                  f"without a result")
+
+        for result in finished:
+            running.pop(result[0])[0].join()
+            yield result
+
+def main():
+    parser = argparse.ArgumentParser(description="MIPMLP preprocessing for several taxonomy levels")
+    parser.add_argument("--input", default=input_path, help="for_preprocess .csv or sparse .npz")
+    parser.add_argument("--levels", type=int, nargs="+", default=LEVELS, choices=range(1, 8),
+                        help=f"Taxonomy levels to produce (default: {LEVELS})")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: one per level)")
+    parser.add_argument("--force", action="store_true", help="Recompute levels whose output is up to date")
+    args = parser.parse_args()
+
+    import MIPMLP
+    mipmlp_version = getattr(MIPMLP, "__version__", "unknown")
+
+    # === Start of execution ===
+    print(f"Loading data from: {args.input}")
+    try:
+        table = load_input(args.input)
+        print(f"Data loaded. Shape: {table.shape}")
+    except Exception as e:
+        print(f"Error loading file: {e}")
+        exit(1)
+
+    os.makedirs(output_dir, exist_ok=True)
+    table_hash = input_hash(args.input)
+
+    todo = []
+    for level in dict.fromkeys(args.levels):
+        out_path = output_path(level, MIPMLP_PARAMS)
+        key = level_key(table_hash, level, MIPMLP_PARAMS, mipmlp_version)
+        if not args.force and is_up_to_date(out_path, key):
+            print(f"⏭  Level {level}: {out_path} is up to date, skipped")
+            continue
+        todo.append((level, out_path, key))
+
+    if not todo:
+        print("\nDone.")
+        return
+
+    n_jobs = min(args.jobs or len(todo), len(todo))
+    print(f"\n--- Processing levels {[t[0] for t in todo]} on {n_jobs} workers ---")
+    rows = []
+    for level, shape, seconds, peak, growth, error in run_levels(table, todo, n_jobs):
+        if error is not None:
+            print(f"❌ Error in Level {level}:\n{error}")
+        else:
+            print(f"✅ Level {level} saved to: {output_path(level, MIPMLP_PARAMS)}")
+            print(f"   Shape: {shape}")
+        rows.append({"level": level, "status": "error" if error else "ok", "seconds": round(seconds, 2),
+                     "peak_rss_mb": round(peak, 1), "rss_growth_mb": round(growth, 1)})
+
+    report = pd.DataFrame(rows).sort_values("level")
+    print("\n=== Per-level timing / memory ===")
+    print(report.to_string(index=False))
+    print("\nDone.")
+
+if __name__ == "__main__":
+    main()
+
+#python /home/pintokf/Projects/Microbium/Mouses/MIPMLP_scripts/run_mipmlp_preprocessing.py --levels 7 6 5
@@ -0,0 +1,72 @@
+"""
+Checks the vectorized calculate_concordance_index against the original double loop
+on random inputs (exact equality, with and without ties) and times both.
+
+python Ratio_model/benchmarks/bench_concordance_index.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.evaluation import calculate_concordance_index, PAIRWISE_MAX_N
+
+def reference_concordance_index(y_true, y_pred):
+    # The original O(n^2) implementation, kept here as the ground truth
+    n = len(y_true)
+    count = 0
+    correct = 0
+    for i in range(n):
+        for j in range(i + 1, n):
+            if y_true[i] != y_true[j]:
+                count += 1
+                if (y_true[i] > y_true[j] and y_pred[i] > y_pred[j]) or \
+                   (y_true[i] < y_true[j] and y_pred[i] < y_pred[j]):
+                    correct += 1
+                elif y_pred[i] == y_pred[j]:
+                    correct += 0.5
+    return correct / count if count > 0 else 0.5
+
+def random_inputs(rng, n, ties):
+    if ties:
+        # Small integer ranges force many ties in both y_true and y_pred
+        return rng.integers(0, 5, n).astype(float), rng.integers(0, 5, n).astype(float)
+    return rng.normal(size=n), rng.normal(size=n)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    value = func(*args)
+    return value, time.perf_counter() - start
+
+def main():
+    rng = np.random.default_rng(0)
+
+    print("--- Equality check ---")
+    sizes = [0, 1, 2, 3, 10, 22, 50, 200, PAIRWISE_MAX_N + 1, 3000]
+    for n in sizes:
+        for ties in (False, True):
+            for _ in range(5 if n < 1000 else 1):
+                y_true, y_pred = random_inputs(rng, n, ties)
+                expected = reference_concordance_index(y_true, y_pred)
+                actual = calculate_concordance_index(y_true, y_pred)
+                if expected != actual:
+                    raise AssertionError(f"n={n} ties={ties}: {actual!r} != {expected!r}")
+        print(f"  n={n:5d}: OK")
+
+    print("\n--- Timing ---")
+    for n in [22, 200, 1000, 3000]:
+        y_true, y_pred = random_inputs(rng, n, ties=False)
+        _, t_ref = timed(reference_concordance_index, y_true, y_pred)
+        _, t_new = timed(calculate_concordance_index, y_true, y_pred)
+        print(f"  n={n:5d}: loop {t_ref * 1000:9.2f} ms | vectorized {t_new * 1000:8.2f} ms | x{t_ref / t_new:.0f}")
+
+    for n in [10000, 100000]:
+        y_true, y_pred = random_inputs(rng, n, ties=False)
+        _, t_new = timed(calculate_concordance_index, y_true, y_pred)
+        print(f"  n={n:6d}: vectorized {t_new * 1000:8.2f} ms (loop skipped)")
+
+if __name__ == "__main__":
+    main()
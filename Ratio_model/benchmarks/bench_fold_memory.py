@@ -0,0 +1,76 @@
+"""
+Peak memory of the sequential per-fold data path (execution.n_jobs: 1) on the
+metabolite inputs:
+  copy - the previous path: train/test/censored .copy() before every fit
+  cow  - the current path: shallow copies with pandas Copy-on-Write on
+         (src/pipeline.py fit_fold / copy_on_write)
+LBL itself is not run; in its place every fold overwrites the target column of
+train and censored in place, as a model that edits its inputs would. Each mode
+runs in its own subprocess so ru_maxrss is clean.
+
+python Ratio_model/benchmarks/bench_fold_memory.py
+"""
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+ratio_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ratio_dir)
+
+DATA_DIR = os.path.join(os.path.dirname(ratio_dir), "Preprocess_ratio", "preprocces_ratio_metabolites")
+TARGET_COL = "diff"
+
+def run_mode(mode):
+    import io
+    from contextlib import redirect_stdout
+    from src.data_loader import load_and_prep_data
+    from src.pipeline import copy_on_write, iter_logo_folds
+
+    with redirect_stdout(io.StringIO()):
+        censored, uncensored = load_and_prep_data(
+            os.path.join(DATA_DIR, "metabolites_censored.csv"),
+            os.path.join(DATA_DIR, "metabolites_uncensored.csv"))
+    censored_target = censored[TARGET_COL].copy()
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    fold_peaks = []
+    for train, test in iter_logo_folds(uncensored):
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+
+        with copy_on_write():
+            if mode == "copy":
+                train_f, test_f, censored_f = train.copy(), test.copy(), censored.copy()
+            else:
+                train_f, test_f, censored_f = train.copy(deep=False), test.copy(deep=False), censored.copy(deep=False)
+            # Stand-in for an LBL fit that edits its inputs
+            train_f[TARGET_COL] = train_f[TARGET_COL] * 1.0
+            censored_f[TARGET_COL] = censored_f[TARGET_COL] * 1.0
+
+        fold_peaks.append(tracemalloc.get_traced_memory()[1] - start)
+        del train_f, test_f, censored_f
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # The caller's frame never sees the edits
+    assert censored[TARGET_COL].equals(censored_target)
+    print(f"{mode},{len(fold_peaks)},{max(fold_peaks)},{rss_after},{rss_after - rss_before}")
+
+def main():
+    print(f"Inputs: {DATA_DIR}")
+    print(f"{'mode':>5} | {'folds':>5} | {'peak/fold (traced)':>18} | {'peak RSS':>10} | {'RSS growth':>10}")
+    for mode in ("copy", "cow"):
+        out = subprocess.run([sys.executable, __file__, mode], capture_output=True, text=True, check=True)
+        name, n_folds, fold_peak, rss, growth = out.stdout.strip().splitlines()[-1].split(",")
+        # ru_maxrss is in KiB on Linux
+        print(f"{name:>5} | {n_folds:>5} | {int(fold_peak) / 2**20:15.2f} MB | "
+              f"{int(rss) / 1024:7.1f} MB | {int(growth) / 1024:7.1f} MB")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run_mode(sys.argv[1])
+    else:
+        main()
@@ -0,0 +1,65 @@
+"""
+Checks the "ridge_gram" LOGO backend against refitting StandardScaler + Ridge on
+every fold (same per-fold |Spearman| top-k features) and times both.
+
+python Ratio_model/benchmarks/bench_logo_ridge.py
+"""
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import LeaveOneGroupOut
+from sklearn.preprocessing import StandardScaler
+
+ratio_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ratio_dir)
+
+from src.data_loader import load_and_prep_data
+from src.feature_ranking import RankingCache, feature_columns
+from src.logo_ridge import run_logo_ridge
+
+DATA_DIR = os.path.join(os.path.dirname(ratio_dir), "Preprocess_ratio", "preprocces_ratio_metabolites")
+PARAMS = {"target_col": "diff", "num_of_bact": 1889, "alpha": 0.001}
+K_VALUES = [10, 25, 50, 100, 250, 500, 1000, 1889]
+
+def refit_logo(uncensored, params, k_values):
+    cols = feature_columns(uncensored, params['num_of_bact'])
+    ranking_cache = RankingCache(uncensored, cols, params['target_col'])
+    predictions = {k: [] for k in k_values}
+    for train_idx, test_idx in LeaveOneGroupOut().split(uncensored, groups=uncensored["Cage"]):
+        train, test = uncensored.iloc[train_idx], uncensored.iloc[test_idx]
+        ranked = ranking_cache.ranking(train)
+        for k in k_values:
+            top = ranked[:k]
+            scaler = StandardScaler().fit(train[top])
+            ridge = Ridge(alpha=params['alpha']).fit(scaler.transform(train[top]), train[params['target_col']])
+            predictions[k].append(ridge.predict(scaler.transform(test[top])))
+    return {k: np.concatenate(p) for k, p in predictions.items()}
+
+def main():
+    with redirect_stdout(io.StringIO()):
+        _, uncensored = load_and_prep_data(
+            os.path.join(DATA_DIR, "metabolites_censored.csv"),
+            os.path.join(DATA_DIR, "metabolites_uncensored.csv"))
+
+    start = time.perf_counter()
+    expected = refit_logo(uncensored, PARAMS, K_VALUES)
+    t_refit = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = run_logo_ridge(uncensored, PARAMS, K_VALUES)
+    t_gram = time.perf_counter() - start
+
+    print(f"{'k':>5} | {'max |diff|':>10} | {'max |pred|':>10}")
+    for k in K_VALUES:
+        pred = actual[k]["predicted_score"].to_numpy()
+        print(f"{k:5d} | {np.max(np.abs(pred - expected[k])):10.3g} | {np.max(np.abs(expected[k])):10.3g}")
+    print(f"\nRefit per fold: {t_refit:.2f} s | Gram downdate: {t_gram:.2f} s")
+    print("(both include the same per-fold Spearman ranking)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Size and pickling time of one LOGO fold task sent to a worker, on the metabolite
+inputs with all 1889 features:
+  frames - (lbl_params, train, test, censored, target_col) pickled per task
+  shared - the same task as row positions + feature names, with the feature
+           block memory-mapped once from /dev/shm (src/shared_data.py)
+Also checks that the worker side rebuilds frames identical to the originals.
+
+python Ratio_model/benchmarks/bench_task_dispatch.py
+"""
+import io
+import os
+import pickle
+import sys
+import time
+from contextlib import redirect_stdout
+
+import pandas as pd
+from sklearn.model_selection import LeaveOneGroupOut
+
+ratio_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ratio_dir)
+
+from src.data_loader import load_and_prep_data
+from src.shared_data import shared_dataset
+
+DATA_DIR = os.path.join(os.path.dirname(ratio_dir), "Preprocess_ratio", "preprocces_ratio_metabolites")
+NUM_OF_BACT = 1889
+
+def main():
+    with redirect_stdout(io.StringIO()):
+        censored, uncensored = load_and_prep_data(
+            os.path.join(DATA_DIR, "metabolites_censored.csv"),
+            os.path.join(DATA_DIR, "metabolites_uncensored.csv"))
+
+    lbl_params = {"feature_selection": 25, "num_of_bact": NUM_OF_BACT}
+    tasks = [(lbl_params, uncensored.iloc[tr], uncensored.iloc[te], censored, "diff")
+             for tr, te in LeaveOneGroupOut().split(uncensored, groups=uncensored["Cage"])]
+
+    with shared_dataset(censored, uncensored, NUM_OF_BACT) as shared:
+        start = time.perf_counter()
+        frame_payloads = [pickle.dumps(task) for task in tasks]
+        frames_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ref_payloads = [pickle.dumps(shared.task_ref(task)) for task in tasks]
+        shared_time = time.perf_counter() - start
+
+        # What a worker receives once, and what it rebuilds per task
+        worker_data = pickle.loads(pickle.dumps(shared))
+        for task, payload in zip(tasks, ref_payloads):
+            rebuilt = worker_data.task_frames(*pickle.loads(payload))
+            for original, copy in zip(task[1:4], rebuilt[1:4]):
+                pd.testing.assert_frame_equal(original, copy)
+
+    n = len(tasks)
+    print(f"Inputs: {DATA_DIR} ({n} folds, {NUM_OF_BACT} features)")
+    print(f"{'mode':>7} | {'bytes/task':>11} | {'pickle ms/task':>14}")
+    print(f"{'frames':>7} | {sum(map(len, frame_payloads)) / n:11.0f} | {1000 * frames_time / n:14.3f}")
+    print(f"{'shared':>7} | {sum(map(len, ref_payloads)) / n:11.0f} | {1000 * shared_time / n:14.3f}")
+    print("Rebuilt worker frames are identical to the originals.")
+
+if __name__ == "__main__":
+    main()
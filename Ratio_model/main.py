@@ -12,15 +12,74 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, script_dir)
 
 from src.data_loader import load_and_prep_data
+from src.batch import load_batch_configs, run_batch
 from src.pipeline import run_pipeline
+from src.search import STRATEGIES, run_search
+from src.stability import run_stability
+
+# Data and output paths in the configs are relative to the Mouses folder (parent of Ratio_model)
+mouses_dir = os.path.dirname(script_dir)
+
+def apply_overrides(config, args):
+    if args.jobs is not None:
+        config.setdefault('execution', {})['n_jobs'] = args.jobs
+    if args.permutations is not None:
+        config.setdefault('permutations', {})['n_permutations'] = args.permutations
+    if args.no_plots:
+        config.setdefault('execution', {})['plots'] = False
+
+def resolve_paths(config):
+    # Make data paths relative to Mouses folder (parent of Ratio_model)
+    config['data']['censored_path'] = os.path.join(mouses_dir, config['data']['censored_path'])
+    config['data']['uncensored_path'] = os.path.join(mouses_dir, config['data']['uncensored_path'])
+
+    # Make output paths relative to Mouses folder
+    config['output_settings']['base_folder'] = os.path.join(mouses_dir, config['output_settings']['base_folder'])
+
+def main_batch(args):
+    source = args.source
+    if source is None:
+        print("Error: batch mode needs a config folder or a matrix spec, e.g. main.py batch configs/")
+        return
+    if args.search is not None or args.stability:
+        print("Error: --search and --stability run a single experiment; they are not supported in batch mode")
+        return
+    if not os.path.isabs(source):
+        source = os.path.join(script_dir, source)
+
+    configs = load_batch_configs(source)
+    for _, config in configs:
+        apply_overrides(config, args)
+        resolve_paths(config)
+
+    print(f"--- Starting Batch: {len(configs)} experiments from {source} ---")
+    # In batch mode --jobs is the number of experiments run at once
+    run_batch(configs, n_jobs=args.jobs if args.jobs is not None else 1, run_hyper=args.hyper)
 
 def main():
     parser = argparse.ArgumentParser(description="Modular Ratio Model Runner")
+    parser.add_argument("mode", nargs="?", choices=("run", "batch"), default="run",
+                       help="run: one config (default); batch: every config in a folder or a matrix spec")
+    parser.add_argument("source", nargs="?", default=None,
+                       help="batch mode: folder of config YAMLs, or a YAML with base + matrix")
     parser.add_argument("--config", type=str, default="config.yaml", 
                        help="Path to config YAML (default: config.yaml in Ratio_model folder)")
     parser.add_argument("--hyper", action="store_true", help="Run hyperparameter search instead of single run")
+    parser.add_argument("--search", nargs="?", const="", choices=("",) + STRATEGIES, default=None,
+                       help="Search over the search.space of model_params (strategy from config, or grid/random/halving)")
+    parser.add_argument("--stability", action="store_true",
+                       help="Coefficient stability of the rank + Ridge model over LOGO folds and bootstrap resamples")
+    parser.add_argument("--jobs", type=int, default=None,
+                       help="Worker processes for LOGO folds (overrides execution.n_jobs, -1 = all cores)")
+    parser.add_argument("--permutations", type=int, default=None,
+                       help="Permutation test with N shuffles of the target (overrides permutations.n_permutations)")
+    parser.add_argument("--no-plots", action="store_true", help="Skip rendering the prediction plots")
     args = parser.parse_args()
 
+    if args.mode == "batch":
+        main_batch(args)
+        return
+
     # Handle both relative and absolute paths
     if os.path.isabs(args.config):
         config_path = args.config
@@ -43,29 +102,44 @@ def main():
     with open(config_path, 'r') as f:
         config = yaml.safe_load(f)
 
+    apply_overrides(config, args)
+
     print(f"--- Starting Run: {config['output_settings']['model_name']} ---")
     print(f"Config: {config_path}")
 
-    # Make data paths relative to Mouses folder (parent of Ratio_model)
-    mouses_dir = os.path.dirname(script_dir)
-    config['data']['censored_path'] = os.path.join(mouses_dir, config['data']['censored_path'])
-    config['data']['uncensored_path'] = os.path.join(mouses_dir, config['data']['uncensored_path'])
-    
-    # Make output paths relative to Mouses folder
-    config['output_settings']['base_folder'] = os.path.join(mouses_dir, config['output_settings']['base_folder'])
+    resolve_paths(config)
+
+    # A list of ages: load once and run every age into its own subfolder
+    if isinstance(config['data'].get('age_filter'), list):
+        if args.search is not None or args.stability:
+            print("Error: --search and --stability need a single age_filter")
+            return
+        out = config['output_settings']
+        run_batch([(os.path.basename(config_path), config)],
+                  n_jobs=config.get('execution', {}).get('n_jobs', 1), run_hyper=args.hyper,
+                  summary_dir=os.path.join(out['base_folder'], out['experiment_group'], out['model_name']))
+        return
 
     # 2. Load Data
     censored, uncensored = load_and_prep_data(
         config['data']['censored_path'],
         config['data']['uncensored_path'],
-        config['data'].get('age_filter')
+        config['data'].get('age_filter'),
+        use_cache=config['data'].get('cache_inputs', True)
     )
     
     # Pass data to config dict
     config['data_loaded'] = (censored, uncensored)
 
     # 3. Execute Pipeline
-    run_pipeline(config, run_hyper=args.hyper)
+    if args.stability:
+        run_stability(config)
+    elif args.search is not None:
+        if args.search:
+            config.setdefault('search', {})['strategy'] = args.search
+        run_search(config)
+    else:
+        run_pipeline(config, run_hyper=args.hyper)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,179 @@
+import copy
+import glob
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import yaml
+
+from src.data_loader import load_and_prep_data, partition_by_age
+from src.pipeline import resolve_n_jobs, run_pipeline
+
+# (censored, uncensored) frames by (data key, age_filter); set in the parent and in every worker
+_DATASETS = {}
+
+def _set_nested(config, dotted_key, value):
+    keys = dotted_key.split(".")
+    node = config
+    for key in keys[:-1]:
+        node = node.setdefault(key, {})
+    node[keys[-1]] = value
+
+def expand_matrix(spec, spec_dir):
+    """
+    מרחיב matrix spec לרשימת קונפיגורציות.
+    spec: {'base': path to a config.yaml (relative to the spec), 'matrix':
+    {'section.key': [values, ...]}, optional 'model_name': template}.
+    Every combination of the matrix values is applied on a copy of the base
+    config. The template is formatted with the last part of each matrix key,
+    e.g. "Ratio_age{age_filter}"; without it the values are appended to the
+    base model_name.
+    """
+    base_path = os.path.join(spec_dir, spec['base'])
+    with open(base_path, 'r') as f:
+        base = yaml.safe_load(f)
+
+    matrix = spec.get('matrix') or {}
+    keys = list(matrix)
+    configs = []
+    for combo in itertools.product(*(matrix[k] for k in keys)):
+        config = copy.deepcopy(base)
+        for key, value in zip(keys, combo):
+            _set_nested(config, key, value)
+
+        fields = {key.split(".")[-1]: ("unfiltered" if value is None else value) for key, value in zip(keys, combo)}
+        if 'model_name' in spec:
+            name = spec['model_name'].format(**fields)
+        else:
+            name = "_".join([base['output_settings']['model_name']] + [f"{k}{v}" for k, v in fields.items()])
+        config['output_settings']['model_name'] = name
+        configs.append((f"{os.path.basename(base_path)} {fields}", config))
+    return configs
+
+def load_batch_configs(source):
+    """
+    Returns [(label, config)] from a folder of config YAMLs or from a matrix spec file.
+    """
+    if os.path.isdir(source):
+        configs = []
+        for path in sorted(glob.glob(os.path.join(source, "*.yaml")) + glob.glob(os.path.join(source, "*.yml"))):
+            with open(path, 'r') as f:
+                config = yaml.safe_load(f)
+            if not isinstance(config, dict) or 'output_settings' not in config:
+                print(f"Skipping {path}: not a run config")
+                continue
+            configs.append((os.path.basename(path), config))
+        return configs
+
+    with open(source, 'r') as f:
+        spec = yaml.safe_load(f)
+    return expand_matrix(spec, os.path.dirname(source))
+
+def age_folder(age):
+    return "unfiltered" if age is None else f"age{age}"
+
+def expand_age_filters(configs):
+    """
+    A config whose data.age_filter is a list becomes one config per age, with
+    its results in <model_name>/age<value> (unfiltered for null).
+    """
+    expanded = []
+    for label, config in configs:
+        ages = config['data'].get('age_filter')
+        if not isinstance(ages, list):
+            expanded.append((label, config))
+            continue
+        for age in dict.fromkeys(ages):
+            age_config = copy.deepcopy(config)
+            age_config['data']['age_filter'] = age
+            out = age_config['output_settings']
+            out['model_name'] = os.path.join(out['model_name'], age_folder(age))
+            expanded.append((f"{label} [{age_folder(age)}]", age_config))
+    return expanded
+
+def _data_key(config):
+    data = config['data']
+    return data['censored_path'], data['uncensored_path'], data.get('cache_inputs', True)
+
+def _init_worker(datasets):
+    # The run log of every experiment is in its own output folder; the terminal
+    # only shows the batch progress printed by the parent
+    sys.stdout = open(os.devnull, "w")
+    _DATASETS.update(datasets)
+
+def run_experiment(config, run_hyper):
+    """
+    מריץ ניסוי אחד מתוך ה-batch על הנתונים שכבר נטענו.
+    Returns (error or None, seconds).
+    """
+    start = time.perf_counter()
+    try:
+        config['data_loaded'] = _DATASETS[(_data_key(config), config['data'].get('age_filter'))]
+        run_pipeline(config, run_hyper=run_hyper)
+        return None, time.perf_counter() - start
+    except Exception:
+        return traceback.format_exc(), time.perf_counter() - start
+
+def run_batch(configs, n_jobs=1, run_hyper=False, summary_dir=None):
+    """
+    מריץ רשימת ניסויים [(label, config)] ב-process pool אחד.
+    Every distinct input CSV pair is loaded once in the parent before the pool
+    starts and split into the age_filter values its experiments need with one
+    groupby; with the fork start method the workers share those frames
+    copy-on-write, otherwise each worker receives one copy at startup.
+    Each experiment runs its folds sequentially and writes to its own
+    experiment_group/model_name folder. A batch_summary.csv is written to
+    summary_dir (default: the base folder of the first experiment).
+    """
+    configs = expand_age_filters(configs)
+    ages = {}
+    for _, config in configs:
+        ages.setdefault(_data_key(config), []).append(config['data'].get('age_filter'))
+        # The pool is already spread over experiments
+        config.setdefault('execution', {})['n_jobs'] = 1
+
+    for key, key_ages in ages.items():
+        censored, uncensored = load_and_prep_data(key[0], key[1], use_cache=key[2])
+        for age, data in partition_by_age(censored, uncensored, dict.fromkeys(key_ages)).items():
+            _DATASETS[(key, age)] = data
+    print(f"Loaded {len(ages)} distinct datasets for {len(configs)} experiments")
+
+    rows = [None] * len(configs)
+    finished = 0
+    def report(i, error, seconds):
+        nonlocal finished
+        label, config = configs[i]
+        out = config['output_settings']
+        status = "ok" if error is None else "error"
+        finished += 1
+        rows[i] = {"experiment_group": out['experiment_group'], "model_name": out['model_name'],
+                   "config": label, "status": status, "seconds": round(seconds, 2),
+                   "error": None if error is None else error.strip().splitlines()[-1]}
+        print(f"[{finished}/{len(configs)}] {out['experiment_group']}/{out['model_name']}: {status} ({seconds:.1f}s)")
+        if error is not None:
+            sys.stderr.write(error)
+
+    n_jobs = min(resolve_n_jobs(n_jobs), max(1, len(configs)))
+    if n_jobs == 1:
+        for i, (_, config) in enumerate(configs):
+            report(i, *run_experiment(config, run_hyper))
+    else:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context,
+                                 initializer=_init_worker, initargs=(_DATASETS,)) as pool:
+            futures = {pool.submit(run_experiment, config, run_hyper): i for i, (_, config) in enumerate(configs)}
+            for future in as_completed(futures):
+                report(futures[future], *future.result())
+
+    if configs:
+        summary_dir = summary_dir or configs[0][1]['output_settings']['base_folder']
+        summary_path = os.path.join(summary_dir, "batch_summary.csv")
+        os.makedirs(summary_dir, exist_ok=True)
+        pd.DataFrame(rows).to_csv(summary_path, index=False)
+        print(f"Batch summary saved to {summary_path}")
+    return rows
@@ -1,39 +1,219 @@
 import pandas as pd
+import glob
+import json
+import os
 import re
 
+# Cleaned copies of the input CSVs are kept in this folder next to each CSV
+CACHE_DIRNAME = ".csv_cache"
+# Part of every cache file name; bump it when the cleaned frame or the cache
+# layout changes, so caches written by older code are not read back
+CACHE_VERSION = 3
+# Feather has no index, so it is stored as the first column (this name = unnamed index)
+_UNNAMED_INDEX = "__index__"
+
+_INVALID_CHARS = r'[^a-zA-Z0-9_]'
+
+# (csv path, size, mtime) -> DataFrame of original/clean column names
+_COLUMN_MAPPINGS = {}
+
 def clean_col_name(name):
-    return re.sub(r'[^a-zA-Z0-9_]', '_', str(name))
+    return re.sub(_INVALID_CHARS, '_', str(name))
 
-def load_and_prep_data(censored_path, uncensored_path, age_filter=None):
-    print(f"Loading data from:\n {censored_path}\n {uncensored_path}")
-    
-    censored = pd.read_csv(censored_path, index_col=0)
-    uncensored = pd.read_csv(uncensored_path, index_col=0)
+def clean_column_names(columns):
+    """
+    מנקה את כל שמות העמודות במעבר וקטורי אחד.
+    Names that collide after cleaning keep the first occurrence as is and get a
+    deterministic suffix (__2, __3, ...) in column order.
+    """
+    cleaned = pd.Index(columns).astype(str).str.replace(_INVALID_CHARS, '_', regex=True)
+    if not cleaned.has_duplicates:
+        return list(cleaned)
+
+    taken = set(cleaned)
+    seen = set()
+    result = []
+    for name in cleaned:
+        if name not in seen:
+            seen.add(name)
+            result.append(name)
+            continue
+        n = 2
+        while f"{name}__{n}" in taken:
+            n += 1
+        unique_name = f"{name}__{n}"
+        taken.add(unique_name)
+        result.append(unique_name)
+
+    n_collisions = len(result) - len(seen)
+    print(f"Warning: {n_collisions} column names collided after cleaning and were suffixed")
+    return result
+
+def _source_key(csv_path):
+    # The key is the source file's size + mtime, so editing the CSV invalidates
+    # the cache, and CACHE_VERSION, so changing how it is built does too
+    st = os.stat(csv_path)
+    folder = os.path.join(os.path.dirname(csv_path), CACHE_DIRNAME)
+    return folder, os.path.basename(csv_path), f"{st.st_size}-{st.st_mtime_ns}-v{CACHE_VERSION}"
+
+def _cache_path(csv_path, drop_nan_target):
+    folder, name, key = _source_key(csv_path)
+    tag = "t" if drop_nan_target else "a"
+    return folder, name, os.path.join(folder, f"{name}.{key}-{tag}.feather")
+
+def load_column_mapping(csv_path, original=None):
+    """
+    Returns a DataFrame with the 'Original' and 'Clean' name of every column of
+    csv_path (index column excluded). Memoized per file version and persisted
+    in the .csv_cache folder, so reports can map clean names back to real ones.
+    original: the file's columns if already parsed (skips the header read).
+    """
+    folder, name, key = _source_key(csv_path)
+    memo_key = (os.path.abspath(csv_path), key)
+    if memo_key in _COLUMN_MAPPINGS:
+        return _COLUMN_MAPPINGS[memo_key]
+
+    mapping_path = os.path.join(folder, f"{name}.{key}.columns.csv")
+    if os.path.exists(mapping_path):
+        mapping = pd.read_csv(mapping_path, dtype=str, keep_default_na=False)
+    else:
+        if original is None:
+            original = pd.read_csv(csv_path, index_col=0, nrows=0).columns
+        mapping = pd.DataFrame({"Original": original.astype(str), "Clean": clean_column_names(original)})
+        try:
+            os.makedirs(folder, exist_ok=True)
+            mapping.to_csv(mapping_path, index=False)
+        except OSError as e:
+            print(f"Warning: could not save column mapping for {name}: {e}")
+
+    _COLUMN_MAPPINGS[memo_key] = mapping
+    return mapping
+
+def _dtypes_path(cache_path):
+    # The dtypes of the cached frame, next to its Feather file
+    return cache_path[:-len(".feather")] + ".dtypes.json"
+
+def _read_cached(cache_path):
+    dtypes_path = _dtypes_path(cache_path)
+    if not (os.path.exists(cache_path) and os.path.exists(dtypes_path)):
+        return None
+    try:
+        df = pd.read_feather(cache_path)
+        with open(dtypes_path) as f:
+            dtypes = json.load(f)
+    except Exception as e:
+        # pyarrow missing or unreadable file - fall back to the CSV
+        print(f"Warning: could not read cache {cache_path}: {e}")
+        return None
+
+    df = df.set_index(df.columns[0])
+    if df.index.name == _UNNAMED_INDEX:
+        df.index.name = None
+
+    # The Arrow round trip may change dtypes (e.g. an integer-like index or
+    # Cage read back as str); restore the ones the CSV path produced
+    if str(df.index.dtype) != dtypes["index"]:
+        df.index = df.index.astype(dtypes["index"])
+    changed = {col: dtype for col, dtype in zip(df.columns, dtypes["columns"]) if str(df[col].dtype) != dtype}
+    if changed:
+        df = df.astype(changed)
+    return df
+
+def _remove_stale_sidecars(csv_path):
+    # Drop cache files written for older versions of the same CSV
+    folder, name, key = _source_key(csv_path)
+    for old in glob.glob(os.path.join(folder, f"{glob.escape(name)}.*")):
+        if not os.path.basename(old).startswith(f"{name}.{key}"):
+            os.remove(old)
+
+def _write_cached(df, folder, name, cache_path):
+    try:
+        os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        index_name = df.index.name if df.index.name is not None else _UNNAMED_INDEX
+        with open(_dtypes_path(cache_path), "w") as f:
+            json.dump({"index": str(df.index.dtype), "columns": [str(dtype) for dtype in df.dtypes]}, f)
+        df.reset_index(names=index_name).to_feather(tmp_path)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        # e.g. pyarrow not installed
+        print(f"Warning: could not cache {name}: {e}")
+
+def load_clean_csv(path, drop_nan_target=False, use_cache=True):
+    """
+    קורא CSV, מנקה שמות עמודות ומוסיף עמודת Cage.
+    With drop_nan_target, rows with NaN in the 'diff' column are removed.
+    The result is cached as Feather next to the CSV, so warm starts skip
+    CSV parsing and column cleaning.
+    """
+    if use_cache:
+        folder, name, cache_path = _cache_path(path, drop_nan_target)
+        df = _read_cached(cache_path)
+        if df is not None:
+            return df
+
+    df = pd.read_csv(path, index_col=0)
 
     # Clean columns
-    censored.columns = [clean_col_name(c) for c in censored.columns]
-    uncensored.columns = [clean_col_name(c) for c in uncensored.columns]
+    df.columns = load_column_mapping(path, original=df.columns)["Clean"].tolist()
+
+    # Extract Cage IDs. read_csv may return one block per column; the copy
+    # consolidates them, so adding a column does not fragment the frame
+    df = df.copy()
+    df["Cage"] = [str(i).split("-")[0] for i in df.index]
+
+    # Remove rows with NaN in target column (critical for feature selection to work)
+    if drop_nan_target:
+        target_col = [c for c in df.columns if "diff" in c.lower()][0]
+        before = len(df)
+        df = df.dropna(subset=[target_col])
+        if len(df) < before:
+            print(f"Removed {before - len(df)} samples with NaN in target column")
+
+    if use_cache:
+        _write_cached(df, folder, name, cache_path)
+        _remove_stale_sidecars(path)
+    return df
+
+def _age_column(df):
+    # מוצא את עמודת הגיל באופן דינמי (מכילה 'Age')
+    return [c for c in df.columns if "Age" in c][0]
+
+def filter_age(censored, uncensored, age_filter):
+    c_age_col = _age_column(censored)
+    u_age_col = _age_column(uncensored)
+    return censored[censored[c_age_col] == age_filter], uncensored[uncensored[u_age_col] == age_filter]
+
+def partition_by_age(censored, uncensored, ages):
+    """
+    מחלק את הנתונים לפי גיל עם groupby אחד לכל טבלה.
+    ages: age values to keep (None = all samples, unfiltered).
+    Returns {age: (censored, uncensored)}; an age with no samples gets empty frames.
+    """
+    partitions = {}
+    groups = []
+    # Only look for the Age column when some age is actually filtered on
+    if any(age is not None for age in ages):
+        for df in (censored, uncensored):
+            groups.append(dict(tuple(df.groupby(_age_column(df), sort=False))))
+
+    for age in ages:
+        if age is None:
+            partitions[age] = (censored, uncensored)
+            continue
+        partitions[age] = tuple(g.get(age, df.iloc[:0]) for g, df in zip(groups, (censored, uncensored)))
+    return partitions
+
+def load_and_prep_data(censored_path, uncensored_path, age_filter=None, use_cache=True):
+    print(f"Loading data from:\n {censored_path}\n {uncensored_path}")
+
+    censored = load_clean_csv(censored_path, use_cache=use_cache)
+    uncensored = load_clean_csv(uncensored_path, drop_nan_target=True, use_cache=use_cache)
 
     # Filter by Age if defined in yaml
     if age_filter is not None:
         print(f"Filtering for Age: {age_filter}")
-        # מוצא את עמודת הגיל באופן דינמי (מכילה 'Age')
-        c_age_col = [c for c in censored.columns if "Age" in c][0]
-        u_age_col = [c for c in uncensored.columns if "Age" in c][0]
-        
-        censored = censored[censored[c_age_col] == age_filter]
-        uncensored = uncensored[uncensored[u_age_col] == age_filter]
-
-    # Extract Cage IDs
-    censored["Cage"] = [str(i).split("-")[0] for i in censored.index]
-    uncensored["Cage"] = [str(i).split("-")[0] for i in uncensored.index]
-
-    # Remove rows with NaN in target column (critical for feature selection to work)
-    target_col = [c for c in uncensored.columns if "diff" in c.lower()][0]
-    uncensored_before = len(uncensored)
-    uncensored = uncensored.dropna(subset=[target_col])
-    if len(uncensored) < uncensored_before:
-        print(f"Removed {uncensored_before - len(uncensored)} samples with NaN in target column")
+        censored, uncensored = filter_age(censored, uncensored, age_filter)
 
     print(f"Loaded: {len(censored)} censored, {len(uncensored)} uncensored samples.")
-    return censored, uncensored
\ No newline at end of file
+    return censored, uncensored
@@ -1,51 +1,251 @@
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from scipy.stats import spearmanr, pearsonr
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-def calculate_concordance_index(y_true, y_pred):
+from src.run_logger import reset_worker_stdout
+
+# Above this size the O(n^2) pair matrix is replaced by the O(n log n) Fenwick sweep
+PAIRWISE_MAX_N = 500
+
+def _concordant_pairs_pairwise(y_true, y_pred):
+    i, j = np.triu_indices(len(y_true), k=1)
+    t_i, t_j = y_true[i], y_true[j]
+    p_i, p_j = y_pred[i], y_pred[j]
+
+    comparable = t_i != t_j
+    concordant = comparable & (((t_i > t_j) & (p_i > p_j)) | ((t_i < t_j) & (p_i < p_j)))
+    tied = comparable & ~concordant & (p_i == p_j)
+    return int(concordant.sum()), int(tied.sum()), int(comparable.sum())
+
+def _concordant_pairs_fenwick(y_true, y_pred):
+    """
+    Sweeps the samples in increasing y_true and keeps the predictions seen so far
+    in a Fenwick tree over prediction ranks, so each sample counts its concordant
+    and pred-tied partners among all samples with a strictly smaller y_true.
+    """
     n = len(y_true)
-    count = 0
-    correct = 0
-    for i in range(n):
-        for j in range(i + 1, n):
-            if y_true[i] != y_true[j]:
-                count += 1
-                if (y_true[i] > y_true[j] and y_pred[i] > y_pred[j]) or \
-                   (y_true[i] < y_true[j] and y_pred[i] < y_pred[j]):
-                    correct += 1
-                elif y_pred[i] == y_pred[j]:
-                    correct += 0.5
+    _, pred_rank = np.unique(y_pred, return_inverse=True)
+    tree = [0] * (pred_rank.max() + 2)
+
+    def prefix(r):
+        total = 0
+        while r > 0:
+            total += tree[r]
+            r -= r & -r
+        return total
+
+    def insert(r):
+        while r < len(tree):
+            tree[r] += 1
+            r += r & -r
+
+    order = np.argsort(y_true, kind="mergesort")
+    t_sorted = y_true[order]
+    r_sorted = (pred_rank[order] + 1).tolist()
+    starts = [0] + (np.flatnonzero(t_sorted[1:] != t_sorted[:-1]) + 1).tolist() + [n]
+
+    concordant = 0
+    tied = 0
+    tied_true_pairs = 0
+    for start, end in zip(starts[:-1], starts[1:]):
+        group = r_sorted[start:end]
+        for r in group:
+            below = prefix(r - 1)
+            concordant += below
+            tied += prefix(r) - below
+        for r in group:
+            insert(r)
+        size = end - start
+        tied_true_pairs += size * (size - 1) // 2
+
+    comparable = n * (n - 1) // 2 - tied_true_pairs
+    return concordant, tied, comparable
+
+def calculate_concordance_index(y_true, y_pred):
+    """
+    Harrell's C-index: pairs tied in y_true are skipped, pairs tied in y_pred count 0.5.
+    Uses a vectorized pair matrix for small inputs and a sort + Fenwick tree sweep
+    (O(n log n)) above PAIRWISE_MAX_N samples.
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+
+    # NaN breaks the sort order, so those inputs keep the pairwise semantics
+    if len(y_true) <= PAIRWISE_MAX_N or np.isnan(y_true).any() or np.isnan(y_pred).any():
+        concordant, tied, count = _concordant_pairs_pairwise(y_true, y_pred)
+    else:
+        concordant, tied, count = _concordant_pairs_fenwick(y_true, y_pred)
+
+    correct = concordant + 0.5 * tied
     return correct / count if count > 0 else 0.5
 
-def evaluate_and_plot(results_df, output_dir, file_prefix="results"):
-    y_true = results_df["diff"].values
-    y_pred = results_df["predicted_score"].values
+def _weighted_pearson(x, y, W):
+    # x, y: (n,) or (B, n); W: (B, n) non-negative sample weights
+    total = W.sum(axis=1, keepdims=True)
+    dx = x - (W * x).sum(axis=1, keepdims=True) / total
+    dy = y - (W * y).sum(axis=1, keepdims=True) / total
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (W * dx * dy).sum(axis=1) / np.sqrt((W * dx * dx).sum(axis=1) * (W * dy * dy).sum(axis=1))
 
-    c_index = calculate_concordance_index(y_true, y_pred)
-    spearman_corr, sp_p = spearmanr(y_true, y_pred)
-    pearson_corr, pe_p = pearsonr(y_true, y_pred)
+def _weighted_ranks(values, W):
+    """
+    Average ranks (as in scipy.stats.rankdata) of the data where sample i is
+    repeated W[b, i] times, for every row b at once. Returns (B, n).
+    """
+    order = np.argsort(values, kind="mergesort")
+    v = values[order]
+    starts = np.flatnonzero(np.r_[True, v[1:] != v[:-1]])
 
-    print(f"\nResults for {file_prefix}:")
-    print(f"  C-Index: {c_index:.4f}")
-    print(f"  Spearman: {spearman_corr:.4f} (p={sp_p:.4g})")
-    print(f"  Pearson: {pearson_corr:.4f} (p={pe_p:.4g})")
+    group_w = np.add.reduceat(W[:, order], starts, axis=1)
+    group_rank = np.cumsum(group_w, axis=1) - group_w + (group_w + 1) / 2
+    ranks_sorted = np.repeat(group_rank, np.diff(np.r_[starts, len(v)]), axis=1)
+
+    ranks = np.empty_like(ranks_sorted)
+    ranks[:, order] = ranks_sorted
+    return ranks
+
+def _weighted_concordance(y_true, y_pred, W):
+    # Copies of the same sample tie in y_true, so the weighted pair counts match
+    # calculate_concordance_index on the materialized resample
+    t_i, t_j = y_true[:, None], y_true[None, :]
+    p_i, p_j = y_pred[:, None], y_pred[None, :]
+    comparable = t_i != t_j
+    concordant = ((t_i > t_j) & (p_i > p_j)) | ((t_i < t_j) & (p_i < p_j))
+    score = concordant + 0.5 * (comparable & ~concordant & (p_i == p_j))
+
+    num = np.einsum("bi,ij,bj->b", W, score, W)
+    den = np.einsum("bi,ij,bj->b", W, comparable.astype(float), W)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den > 0, num / den, 0.5)
+
+def bootstrap_metrics(results_df, n_resamples=2000, confidence=0.95, seed=42, group_col="Cage"):
+    """
+    Cage-level bootstrap confidence intervals for C-index, Spearman and Pearson.
+    All resamples are drawn as one (n_resamples x n_cages) index matrix and turned
+    into per-sample weights, so every metric is computed for all resamples in one
+    vectorized pass, with no refitting and no materialized copies.
+    Returns {"<metric>_ci_low": ..., "<metric>_ci_high": ...}.
+    """
+    y_true = results_df["diff"].to_numpy(dtype=float)
+    y_pred = results_df["predicted_score"].to_numpy(dtype=float)
+    cage_codes, cages = pd.factorize(results_df[group_col])
+
+    rng = np.random.default_rng(seed)
+    draws = rng.integers(0, len(cages), size=(n_resamples, len(cages)))
+    counts = np.zeros((n_resamples, len(cages)))
+    np.add.at(counts, (np.arange(n_resamples)[:, None], draws), 1)
+    W = counts[:, cage_codes]
+
+    boot = {
+        "c_index": _weighted_concordance(y_true, y_pred, W),
+        "spearman": _weighted_pearson(_weighted_ranks(y_true, W), _weighted_ranks(y_pred, W), W),
+        "pearson": _weighted_pearson(y_true, y_pred, W),
+    }
+
+    tail = (1 - confidence) / 2 * 100
+    intervals = {}
+    for name, values in boot.items():
+        low, high = np.nanpercentile(values, [tail, 100 - tail])
+        intervals[f"{name}_ci_low"] = float(low)
+        intervals[f"{name}_ci_high"] = float(high)
+
+    print(f"  Bootstrap {confidence:.0%} CI ({n_resamples} cage resamples):")
+    for name in boot:
+        print(f"    {name}: [{intervals[f'{name}_ci_low']:.4f}, {intervals[f'{name}_ci_high']:.4f}]")
+    return intervals
+
+def render_plot(y_true, y_pred, c_index, spearman_corr, plot_path):
+    # matplotlib is imported only when a plot is actually drawn
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
 
-    # Plot
     plt.figure(figsize=(10, 6))
     plt.scatter(y_true, y_pred, color='purple', alpha=0.7)
     plt.xlabel("True Survival Diff")
     plt.ylabel("Predicted Score (LOOCV)")
     plt.title(f"LOOCV Prediction\nCI: {c_index:.2f}, Spearman: {spearman_corr:.2f}")
     plt.grid(True, alpha=0.3)
-    
-    plot_path = os.path.join(output_dir, f"{file_prefix}_plot.png")
+
     plt.savefig(plot_path)
     plt.close()
+    return plot_path
+
+class PlotQueue(object):
+    """
+    מרנדר את הגרפים בתהליך רקע אחד, כדי שהחישוב לא יחכה ל-matplotlib.
+    Plots are queued to a single background process (Agg backend) and rendered
+    there in submission order; close() waits for the batch to finish.
+    With enabled=False plots are skipped entirely.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._pool = None
+        self._pending = []
+
+    def submit(self, *args):
+        if not self.enabled:
+            return
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=1, initializer=reset_worker_stdout)
+        self._pending.append(self._pool.submit(render_plot, *args))
+
+    def close(self):
+        if self._pool is None:
+            return
+        for future in self._pending:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error rendering plot: {e}")
+        self._pool.shutdown()
+        print(f"Rendered {len(self._pending)} plots.")
+        self._pool = None
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def compute_metrics(results_df, file_prefix="results"):
+    y_true = results_df["diff"].values
+    y_pred = results_df["predicted_score"].values
+
+    c_index = calculate_concordance_index(y_true, y_pred)
+    spearman_corr, sp_p = spearmanr(y_true, y_pred)
+    pearson_corr, pe_p = pearsonr(y_true, y_pred)
+
+    print(f"\nResults for {file_prefix}:")
+    print(f"  C-Index: {c_index:.4f}")
+    print(f"  Spearman: {spearman_corr:.4f} (p={sp_p:.4g})")
+    print(f"  Pearson: {pearson_corr:.4f} (p={pe_p:.4g})")
 
     return {
         "c_index": c_index, 
         "spearman": spearman_corr, 
         "pearson": pearson_corr, 
         "p_spearman": sp_p
-    }
\ No newline at end of file
+    }
+
+def evaluate_and_plot(results_df, output_dir, file_prefix="results", plot_queue=None):
+    """
+    מחשב מדדים ומצייר גרף תחזית מול אמת.
+    Without plot_queue the plot is rendered inline; with one it is queued and
+    the metrics return immediately.
+    """
+    metrics = compute_metrics(results_df, file_prefix)
+
+    plot_args = (results_df["diff"].values, results_df["predicted_score"].values,
+                 metrics["c_index"], metrics["spearman"],
+                 os.path.join(output_dir, f"{file_prefix}_plot.png"))
+    if plot_queue is None:
+        render_plot(*plot_args)
+    else:
+        plot_queue.submit(*plot_args)
+
+    return metrics
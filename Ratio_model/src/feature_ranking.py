@@ -0,0 +1,102 @@
+import hashlib
+import numpy as np
+import pandas as pd
+from scipy.stats import t as t_dist
+
+def feature_columns(df, num_of_bact):
+    # LBL treats the first num_of_bact columns as the feature block
+    return list(df.columns[:num_of_bact])
+
+def frame_fingerprint(df):
+    h = hashlib.sha1()
+    h.update("\x1f".join(map(str, df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return h.hexdigest()
+
+def index_hash(index):
+    return hashlib.sha1(pd.util.hash_pandas_object(pd.Index(index), index=False).values.tobytes()).hexdigest()
+
+def spearman_correlations(X, y, nan_policy="propagate"):
+    """
+    Spearman correlation (and two-sided p-value) of every column of X with y,
+    equal to scipy.stats.spearmanr per column.
+    כל העמודות מדורגות פעם אחת, והמתאמים מחושבים במכפלת מטריצות אחת.
+    nan_policy="propagate": a column with a NaN (or any NaN in y) gets NaN, like
+    spearmanr's default. "omit": each column uses the samples where both it and
+    y are present, ranked within those samples.
+    Constant columns get NaN. Returns a DataFrame indexed by column with
+    'coef' and 'p_value'.
+    """
+    values = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    present = ~np.isnan(values) & ~np.isnan(y)[:, None]
+
+    if present.all():
+        # No missing values: one rank vector for y serves every column
+        n = np.full(values.shape[1], len(y), dtype=float)
+        x_ranks = pd.DataFrame(values).rank(method="average").to_numpy()
+        y_ranks = np.broadcast_to(pd.Series(y).rank(method="average").to_numpy()[:, None], values.shape)
+    else:
+        n = present.sum(axis=0).astype(float)
+        x_ranks = pd.DataFrame(np.where(present, values, np.nan)).rank(method="average").to_numpy()
+        # Average rank of y among the present samples of every column:
+        # #smaller + (#equal + 1) / 2, both counted over the column's mask
+        below = (y[None, :] < y[:, None]) + 0.5 * (y[None, :] == y[:, None])
+        y_ranks = below @ present + 0.5
+
+    # Both rank vectors of a column are ranks 1..n, so their mean is (n + 1) / 2
+    mean = (n + 1) / 2
+    dx = np.where(present, x_ranks - mean, 0.0)
+    dy = np.where(present, y_ranks - mean, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coef = (dx * dy).sum(axis=0) / np.sqrt((dx ** 2).sum(axis=0) * (dy ** 2).sum(axis=0))
+        coef = np.clip(coef, -1.0, 1.0)
+
+        dof = n - 2
+        t = coef * np.sqrt(dof / ((1.0 - coef) * (1.0 + coef)))
+        p_value = 2 * t_dist.sf(np.abs(t), dof)
+    p_value = np.where(dof > 0, p_value, np.nan)
+
+    if nan_policy == "propagate":
+        missing = ~present.all(axis=0)
+        coef[missing] = np.nan
+        p_value[missing] = np.nan
+    elif nan_policy != "omit":
+        raise ValueError(f"nan_policy must be 'propagate' or 'omit', got {nan_policy!r}")
+
+    return pd.DataFrame({"coef": coef, "p_value": p_value},
+                        index=getattr(X, "columns", pd.RangeIndex(values.shape[1])))
+
+def rank_features(X, y):
+    """
+    מדרג את הפיצ'רים לפי |Spearman| מול y (מהגבוה לנמוך).
+    Features with an undefined correlation (e.g. constant columns) go last.
+    """
+    ranked = spearman_correlations(X, y)["coef"].abs().sort_values(
+        ascending=False, kind="mergesort", na_position="last")
+    return list(ranked.index)
+
+class RankingCache:
+    """
+    Per-fold feature ranking, computed once and reused for every k of a sweep.
+    Keyed on the training-index hash and the fingerprint of the feature matrix.
+    """
+    def __init__(self, data, feature_cols, target_col):
+        self.feature_cols = feature_cols
+        self.target_col = target_col
+        self.fingerprint = frame_fingerprint(data[feature_cols + [target_col]])
+        self._rankings = {}
+
+    def ranking(self, train):
+        key = (index_hash(train.index), self.fingerprint)
+        if key not in self._rankings:
+            self._rankings[key] = rank_features(train[self.feature_cols], train[self.target_col])
+        return self._rankings[key]
+
+    def top_features(self, train, k):
+        return self.ranking(train)[:k]
+
+def prune_to_features(df, selected, feature_cols):
+    # Selected features first (LBL reads the feature block positionally), then metadata
+    feature_set = set(feature_cols)
+    return df[list(selected) + [c for c in df.columns if c not in feature_set]]
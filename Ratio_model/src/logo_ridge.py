@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import LeaveOneGroupOut
+
+from src.feature_ranking import RankingCache, feature_columns
+
+class LogoRidge:
+    """
+    Exact leave-one-group-out predictions of StandardScaler + Ridge (the final
+    stage of the winner models, see extract_coeffs_*.py) without refitting.
+
+    Column sums, sums of squares, XᵀX and Xᵀy are computed once on all samples
+    and each fold downdates them by its held-out group. Ridge on standardized
+    features equals Ridge on centered raw features with the penalty of feature j
+    scaled by its variance, so standardization stays exact. Folds with more
+    features than training samples solve the equivalent n x n dual system instead
+    of the k x k primal one.
+    """
+    def __init__(self, X, y, alpha):
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        # Global shift keeps the downdated centered statistics well conditioned
+        self.X = X - X.mean(axis=0)
+        self.y = y
+        self.alpha = alpha
+
+        self.n = len(y)
+        self.sum_x = self.X.sum(axis=0)
+        self.sum_sq = (self.X ** 2).sum(axis=0)
+        self.sum_y = y.sum()
+        self.xty = self.X.T @ y
+        self._xtx = None
+
+    @property
+    def xtx(self):
+        # Only the primal solve needs the full Gram matrix
+        if self._xtx is None:
+            self._xtx = self.X.T @ self.X
+        return self._xtx
+
+    def _solve(self, A, b):
+        try:
+            return np.linalg.solve(A, b)
+        except np.linalg.LinAlgError:
+            return np.linalg.lstsq(A, b, rcond=None)[0]
+
+    def predict_held_out(self, test_idx, features):
+        """
+        Fits on every sample outside test_idx using the feature indices in
+        features, and returns the predictions for test_idx.
+        """
+        f = np.asarray(features)
+        X_out = self.X[np.ix_(test_idx, f)]
+        y_out = self.y[test_idx]
+
+        n = self.n - len(test_idx)
+        mu = (self.sum_x[f] - X_out.sum(axis=0)) / n
+        y_mean = (self.sum_y - y_out.sum()) / n
+        var = (self.sum_sq[f] - (X_out ** 2).sum(axis=0)) / n - mu ** 2
+
+        # StandardScaler leaves constant columns unscaled
+        var = np.where(var > 1e-12 * (1.0 + mu ** 2), var, 1.0)
+
+        if len(f) <= n:
+            cxx = self.xtx[np.ix_(f, f)] - X_out.T @ X_out - n * np.outer(mu, mu)
+            cxy = self.xty[f] - X_out.T @ y_out - n * mu * y_mean
+            beta = self._solve(cxx + self.alpha * np.diag(var), cxy)
+            return y_mean + (X_out - mu) @ beta
+
+        train_mask = np.ones(self.n, dtype=bool)
+        train_mask[test_idx] = False
+        sd = np.sqrt(var)
+        Z = (self.X[np.ix_(train_mask, f)] - mu) / sd
+        dual = self._solve(Z @ Z.T + self.alpha * np.eye(n), self.y[train_mask] - y_mean)
+        return y_mean + ((X_out - mu) / sd) @ (Z.T @ dual)
+
+def run_logo_ridge(uncensored, params, k_values):
+    """
+    LOGO CV backend "ridge_gram": |Spearman| top-k selection on each training fold
+    followed by standardized Ridge, for every k at once.
+    Only the uncensored samples are used (censored data and the LBL-specific
+    parameters do not apply to this backend).
+    Returns {k: results_df} with the same columns as the LBL backend.
+    """
+    target_col = params['target_col']
+    cols = feature_columns(uncensored, params['num_of_bact'])
+    col_idx = {c: i for i, c in enumerate(cols)}
+
+    engine = LogoRidge(uncensored[cols].to_numpy(dtype=float), uncensored[target_col].to_numpy(), params['alpha'])
+    ranking_cache = RankingCache(uncensored, cols, target_col)
+
+    predictions = {k: [] for k in k_values}
+    logo = LeaveOneGroupOut()
+    for train_idx, test_idx in logo.split(uncensored, groups=uncensored["Cage"]):
+        ranked = [col_idx[c] for c in ranking_cache.ranking(uncensored.iloc[train_idx])]
+        test = uncensored.iloc[test_idx]
+
+        for k in k_values:
+            fold_res = test[[target_col]].copy()
+            fold_res["predicted_score"] = engine.predict_held_out(test_idx, ranked[:k])
+            fold_res["Cage"] = test["Cage"].iloc[0]
+            predictions[k].append(fold_res)
+
+    return {k: pd.concat(folds) if folds else None for k, folds in predictions.items()}
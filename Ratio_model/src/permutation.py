@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from src.evaluation import calculate_concordance_index
+from src.feature_ranking import frame_fingerprint
+from src.run_logger import reset_worker_stdout
+from src.run_manifest import read_jsonl_records
+
+def permuted_c_index(censored, uncensored, params, k_values, seed_seq, perm=None):
+    """
+    מערבב את ה-target בתוך הדגימות הלא-מצונזרות ומריץ LOGO לכל k.
+    All k values run as one grid, so each fold is ranked once (and ridge_gram
+    scores every k in one pass). The fold timing records of permutation perm
+    are tagged with it, apart from those of the real run.
+    Returns {k: c_index or None}.
+    """
+    # Imported here because the pipeline itself imports this module
+    from src.pipeline import iter_logo_grid
+
+    target_col = params['target_col']
+    rng = np.random.default_rng(seed_seq)
+    shuffled = uncensored.copy()
+    shuffled[target_col] = rng.permutation(shuffled[target_col].to_numpy())
+
+    scores = {}
+    for k, results_df in iter_logo_grid(censored, shuffled, params, k_values, log_tags={"permutation": perm}):
+        if results_df is None:
+            scores[k] = None
+        else:
+            scores[k] = calculate_concordance_index(results_df[target_col].values,
+                                                    results_df["predicted_score"].values)
+    return scores
+
+def _checkpoint_path(output_dir, censored, uncensored, params, seed):
+    # A different config or dataset gets its own checkpoint file. k is not part
+    # of the key: every record keeps its scores per k, so runs over other k
+    # values (or k values finishing in another order) share the file
+    params = {key: value for key, value in params.items() if key != 'feature_selection'}
+    h = hashlib.sha1()
+    h.update(frame_fingerprint(censored).encode())
+    h.update(frame_fingerprint(uncensored).encode())
+    h.update(json.dumps([params, seed], sort_keys=True, default=str).encode())
+    return os.path.join(output_dir, f"permutations_{h.hexdigest()[:12]}.jsonl")
+
+def _load_checkpoint(path):
+    done = {}
+    for record in read_jsonl_records(path):
+        done.setdefault(record["perm"], {}).update({k: c for k, c in record["c_index"]})
+    return done
+
+def run_permutation_test(censored, uncensored, params, k_values, observed, output_dir,
+                         n_permutations, n_jobs=1, seed=42):
+    """
+    Permutation null distribution of the LOGO C-index for every k.
+    Permutation i always uses stream i of SeedSequence(seed), so results do not
+    depend on which worker ran it. Finished permutations are appended to a
+    checkpoint file in output_dir, and a rerun with the same config resumes,
+    scoring only the k values a permutation is still missing.
+    observed: {k: c_index}. Returns {k: empirical p-value}.
+    """
+    from src.pipeline import resolve_n_jobs
+
+    if not k_values:
+        return {}
+    path = _checkpoint_path(output_dir, censored, uncensored, params, seed)
+    done = _load_checkpoint(path)
+    seeds = np.random.SeedSequence(seed).spawn(n_permutations)
+    # JSON keeps the k values of the records as ints, as in k_values
+    missing = {i: [k for k in k_values if k not in done.get(i, {})] for i in range(n_permutations)}
+    todo = [i for i in range(n_permutations) if missing[i]]
+
+    print(f"\n--- Permutation test: {n_permutations} permutations "
+          f"({n_permutations - len(todo)} from checkpoint {os.path.basename(path)}) ---")
+
+    with open(path, "a") as checkpoint:
+        def record(i, scores):
+            done.setdefault(i, {}).update(scores)
+            checkpoint.write(json.dumps({"perm": i, "c_index": list(scores.items())}) + "\n")
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+
+        n_jobs = min(resolve_n_jobs(n_jobs), max(1, len(todo)))
+        if n_jobs == 1:
+            for i in todo:
+                record(i, permuted_c_index(censored, uncensored, params, missing[i], seeds[i], i))
+        elif todo:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=reset_worker_stdout) as pool:
+                futures = {pool.submit(permuted_c_index, censored, uncensored, params, missing[i], seeds[i], i): i
+                           for i in todo}
+                for future in as_completed(futures):
+                    record(futures[future], future.result())
+
+    p_values = {}
+    for k in k_values:
+        null = np.array([done[i][k] for i in range(n_permutations) if done[i].get(k) is not None])
+        if k not in observed or len(null) == 0:
+            p_values[k] = None
+            continue
+        p_values[k] = (1 + np.sum(null >= observed[k])) / (1 + len(null))
+        print(f"  k={k}: C-Index {observed[k]:.4f}, permutation p={p_values[k]:.4g} ({len(null)} permutations)")
+    return p_values
@@ -1,25 +1,25 @@
 import pandas as pd
 import os
 import sys
+import time
+import traceback
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from sklearn.model_selection import LeaveOneGroupOut
 
 # Import LBL from ratio-t2e package (installed via pip)
 sys.path.insert(0, '/home/pintokf/miniconda3/envs/ratio_env/lib/python3.10/site-packages')
 from LBL import LBL
 
-from src.evaluation import evaluate_and_plot
-
-# מחלקת לוגר כדי לשמור את הפלטים לקובץ טקסט
-class Logger(object):
-    def __init__(self, filepath):
-        self.terminal = sys.stdout
-        self.log = open(filepath, "w")
-    def write(self, message):
-        self.terminal.write(message)
-        self.log.write(message)
-    def flush(self):
-        self.terminal.flush()
-        self.log.flush()
+from src.evaluation import PlotQueue, bootstrap_metrics, evaluate_and_plot
+from src.feature_ranking import RankingCache, feature_columns, prune_to_features
+from src.result_cache import make_result_cache
+from src.logo_ridge import run_logo_ridge
+from src.permutation import run_permutation_test
+from src.run_manifest import RunManifest
+from src.shared_data import shared_dataset
+from src.run_logger import RunLogger, log_fold_timing, reset_worker_stdout
 
 def create_output_dir(cfg):
     base = cfg['output_settings']['base_folder']
@@ -30,14 +30,38 @@ def create_output_dir(cfg):
         os.makedirs(full_path)
     return full_path
 
-def run_logo_cv(censored, uncensored, params, feature_k):
+def resolve_n_jobs(n_jobs):
     """
-    מריץ סיבוב LOOCV אחד.
-    מקבל את כל הפרמטרים מה-YAML ומעביר אותם ל-LBL.
+    ממיר את n_jobs מהקונפיגורציה למספר תהליכים בפועל.
+    None / 1 = ריצה סדרתית, -1 = כל הליבות.
     """
-    logo = LeaveOneGroupOut()
-    all_predictions = []
+    if n_jobs is None:
+        return 1
+    n_jobs = int(n_jobs)
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return max(1, n_jobs)
 
+@contextmanager
+def copy_on_write():
+    """
+    pandas Copy-on-Write inside the block only (pandas >= 3 always has it).
+    Frames derived from another share its data until one of them is modified,
+    and then only the modified columns are copied.
+    On pandas < 3 a chained assignment, which Copy-on-Write turns into a
+    no-op, raises instead, so a fit that relies on one fails instead of
+    silently giving other results.
+    """
+    if int(pd.__version__.split(".")[0]) >= 3:
+        yield
+        return
+    chained = getattr(pd.errors, "ChainedAssignmentError", None)
+    with pd.option_context("mode.copy_on_write", True), warnings.catch_warnings():
+        if chained is not None:
+            warnings.simplefilter("error", chained)
+        yield
+
+def build_lbl_params(params, feature_k):
     # שימוש בפרמטרים מתוך הקונפיגורציה
     lbl_params = {
         "tag_column": params['target_col'],
@@ -51,62 +75,294 @@ def run_logo_cv(censored, uncensored, params, feature_k):
         "only_microbiome": params['only_microbiome'],
         "alpha": params['alpha']
     }
-    
+
     # הוספת categories אם קיים (למקרה שצריך בעתיד)
     if 'categories' in params:
         lbl_params['categories'] = params['categories']
+    return lbl_params
 
-    for i, (train_idx, test_idx) in enumerate(logo.split(uncensored, groups=uncensored["Cage"])):
-        train = uncensored.iloc[train_idx]
-        test = uncensored.iloc[test_idx]
-        current_cage = test["Cage"].iloc[0]
+def fit_fold(lbl_params, train, test, censored, target_col):
+    """
+    מאמן ומנבא fold יחיד (כלוב אחד בחוץ).
+    רץ גם בתוך תהליך עובד, ולכן מחזיר את השגיאה כטקסט במקום לזרוק אותה.
+    LBL gets shallow copies of the frames and runs under copy_on_write(): they
+    share the caller's data, and a change LBL makes copies only the columns
+    it touches and never reaches the caller's frames.
+    Returns: (cage, fold_res or None, (error, traceback) or None, seconds)
+    """
+    current_cage = test["Cage"].iloc[0]
+    start = time.perf_counter()
+    try:
+        with copy_on_write():
+            train, test, censored = train.copy(deep=False), test.copy(deep=False), censored.copy(deep=False)
+            fold_res = test[[target_col]].copy()
 
-        # אתחול המודל עם כל הפרמטרים
-        lbl = LBL(**lbl_params)
-        
-        try:
-            lbl.fit(train.copy(), censored.copy())
-            preds = lbl.predict(test.copy())
-            
-            fold_res = test[[params['target_col']]].copy()
-            fold_res["predicted_score"] = preds
-            fold_res["Cage"] = current_cage
-            all_predictions.append(fold_res)
-            
-        except Exception as e:
-            import traceback
-            print(f"Error in Cage {current_cage}: {e}")
-            traceback.print_exc()
+            # אתחול המודל עם כל הפרמטרים
+            lbl = LBL(**lbl_params)
+            lbl.fit(train, censored)
+            preds = lbl.predict(test)
+
+        fold_res["predicted_score"] = preds
+        fold_res["Cage"] = current_cage
+        return current_cage, fold_res, None, time.perf_counter() - start
+
+    except Exception as e:
+        return current_cage, None, (str(e), traceback.format_exc()), time.perf_counter() - start
+
+def make_ranking_cache(uncensored, params):
+    """
+    feature_ranking: "spearman" מדרג את הפיצ'רים פעם אחת לכל fold ומשתמש בקידומת לכל k.
+    The default ("lbl") leaves feature selection to LBL and returns None.
+    """
+    if params.get('feature_ranking', 'lbl') != 'spearman':
+        return None
+    return RankingCache(uncensored, feature_columns(uncensored, params['num_of_bact']), params['target_col'])
+
+def make_fold_task(params, feature_k, train, test, censored, ranking_cache=None):
+    lbl_params = build_lbl_params(params, feature_k)
+
+    if ranking_cache is not None:
+        # LBL gets only the top-k columns, so its own selection keeps all of them
+        selected = ranking_cache.top_features(train, feature_k)
+        cols = ranking_cache.feature_cols
+        train = prune_to_features(train, selected, cols)
+        test = prune_to_features(test, selected, cols)
+        censored = prune_to_features(censored, selected, cols)
+        lbl_params['num_of_bact'] = len(selected)
+        lbl_params['feature_selection'] = len(selected)
+
+    return (lbl_params, train, test, censored, params['target_col'])
+
+def logo_splits(uncensored):
+    # The LOGO partition (one held-out cage per fold) as (train_idx, test_idx) positions
+    return list(LeaveOneGroupOut().split(uncensored, groups=uncensored["Cage"]))
+
+def iter_logo_folds(uncensored):
+    for train_idx, test_idx in logo_splits(uncensored):
+        yield uncensored.iloc[train_idx], uncensored.iloc[test_idx]
+
+# The SharedDataset of the current pool, set by _init_worker in each worker
+_WORKER_DATA = None
+
+def _init_worker(shared=None):
+    global _WORKER_DATA
+    reset_worker_stdout()
+    _WORKER_DATA = shared
+
+def _fit_shared_fold(*task_ref):
+    # Rebuilds the fold frames from the memory-mapped feature blocks; they are new
+    # frames owned by this call
+    return fit_fold(*_WORKER_DATA.task_frames(*task_ref))
+
+def _run_fold_tasks(tasks, n_jobs, shared=None):
+    n_jobs = min(resolve_n_jobs(n_jobs), max(1, len(tasks)))
+    if n_jobs == 1:
+        for key, args in tasks:
+            yield key, fit_fold(*args)
+        return
+
+    # The shared dataset reaches each worker once; its tasks are row positions and feature names
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(shared,)) as pool:
+        if shared is not None:
+            futures = {pool.submit(_fit_shared_fold, *shared.task_ref(args)): key for key, args in tasks}
+        else:
+            # Each task is pickled separately, so workers own their copy of the frames
+            futures = {pool.submit(fit_fold, *args): key for key, args in tasks}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+def _iter_fold_results(tasks, n_jobs, result_cache, shared):
+    if result_cache is None:
+        for key, result in _run_fold_tasks(tasks, n_jobs, shared):
+            yield key, result, False
+        return
+
+    cache_keys = {}
+    to_run = []
+    for key, args in tasks:
+        cache_key = result_cache.key(*args)
+        cached = result_cache.load(cache_key, args[-1])
+        if cached is not None:
+            yield key, cached, True
+        else:
+            cache_keys[key] = (cache_key, args[-1])
+            to_run.append((key, args))
+
+    for key, result in _run_fold_tasks(to_run, n_jobs, shared):
+        cache_key, target_col = cache_keys[key]
+        result_cache.store(cache_key, result, target_col)
+        yield key, result, False
+
+def execute_folds(tasks, n_jobs=1, result_cache=None, shared=None, log_tags=None):
+    """
+    מריץ רשימת משימות fold בצורה סדרתית או על process pool.
+    tasks: list of ((k, fold), (lbl_params, train, test, censored, target_col))
+    Yields ((k, fold), fit_fold result) in completion order.
+    Folds found in result_cache are yielded first without refitting.
+    With shared (a SharedDataset of the same data), pool workers read the
+    features from shared memory instead of receiving the frames per task.
+    Every fold is also logged as a timing record (see run_logger), with the
+    extra fields in log_tags.
+    """
+    for key, result, cached in _iter_fold_results(tasks, n_jobs, result_cache, shared):
+        k, fold = key
+        current_cage, _, error, seconds = result
+        status = "cached" if cached else ("error" if error is not None else "ok")
+        log_fold_timing(k=k, fold=fold, cage=current_cage, status=status, seconds=round(seconds, 4),
+                        **(log_tags or {}))
+        yield key, result
+
+def _is_parallel(n_jobs, tasks):
+    return min(resolve_n_jobs(n_jobs), len(tasks)) > 1
+
+def collect_fold_results(fold_results):
+    """
+    מאחד תוצאות fold לפי סדר הכלובים ומדפיס שגיאות כמו בריצה הסדרתית.
+    fold_results: list of fit_fold results, in fold (cage) order.
+    """
+    all_predictions = []
+    for current_cage, fold_res, error, _ in fold_results:
+        if error is not None:
+            message, tb = error
+            print(f"Error in Cage {current_cage}: {message}")
+            sys.stderr.write(tb)
+            continue
+        all_predictions.append(fold_res)
 
     if not all_predictions:
         return None
 
     return pd.concat(all_predictions)
 
+def run_logo_cv(censored, uncensored, params, feature_k, n_jobs=1, result_cache=None):
+    """
+    מריץ סיבוב LOOCV אחד.
+    מקבל את כל הפרמטרים מה-YAML ומעביר אותם ל-LBL.
+    n_jobs > 1 מריץ את ה-folds במקביל; התוצאות נאספות לפי סדר הכלובים.
+    """
+    if params.get('cv_backend', 'lbl') == 'ridge_gram':
+        return run_logo_ridge(uncensored, params, [feature_k])[feature_k]
+
+    ranking_cache = make_ranking_cache(uncensored, params)
+
+    tasks = [
+        ((feature_k, i), make_fold_task(params, feature_k, train, test, censored, ranking_cache))
+        for i, (train, test) in enumerate(iter_logo_folds(uncensored))
+    ]
+
+    fold_results = [None] * len(tasks)
+    with shared_dataset(censored, uncensored, params['num_of_bact'], enabled=_is_parallel(n_jobs, tasks)) as shared:
+        for (_, i), result in execute_folds(tasks, n_jobs, result_cache, shared):
+            fold_results[i] = result
+
+    return collect_fold_results(fold_results)
+
+def iter_logo_grid(censored, uncensored, params, k_values, n_jobs=1, result_cache=None, manifest=None,
+                   log_tags=None):
+    """
+    מריץ את כל הזוגות (k, fold) של חיפוש ההיפרפרמטרים על אותו pool.
+    Yields (k, results_df) as soon as all folds of that k are done.
+    Cells already in manifest (a RunManifest) are not refitted, and every newly
+    finished cell is recorded in it. log_tags: extra fields of the fold timing
+    records (see execute_folds).
+    """
+    if params.get('cv_backend', 'lbl') == 'ridge_gram':
+        # All k values come out of one pass over the folds
+        yield from run_logo_ridge(uncensored, params, k_values).items()
+        return
+
+    folds = list(iter_logo_folds(uncensored))
+    # The ranking of each fold is computed once and shared by every k
+    ranking_cache = make_ranking_cache(uncensored, params)
+    target_col = params['target_col']
+
+    pending = {k: [None] * len(folds) for k in k_values}
+    remaining = {k: len(folds) for k in k_values}
+
+    def finish(k, i, result):
+        # True once every fold of k is in
+        pending[k][i] = result
+        remaining[k] -= 1
+        return remaining[k] == 0
+
+    tasks = []
+    resumed = []
+    for k in k_values:
+        for i, (train, test) in enumerate(folds):
+            if manifest is not None and (k, i) in manifest:
+                resumed.append((k, i))
+            else:
+                tasks.append(((k, i), make_fold_task(params, k, train, test, censored, ranking_cache)))
+
+    if resumed:
+        print(f"Resuming: {len(resumed)} of {len(resumed) + len(tasks)} (k, fold) cells found in {manifest.path}")
+    for k, i in resumed:
+        result = manifest.load((k, i), target_col)
+        log_fold_timing(k=k, fold=i, cage=result[0], status="resumed", seconds=0.0)
+        if finish(k, i, result):
+            yield k, collect_fold_results(pending.pop(k))
+
+    with shared_dataset(censored, uncensored, params['num_of_bact'], enabled=_is_parallel(n_jobs, tasks)) as shared:
+        for (k, i), result in execute_folds(tasks, n_jobs, result_cache, shared, log_tags):
+            if manifest is not None:
+                manifest.record((k, i), result, target_col)
+            if finish(k, i, result):
+                yield k, collect_fold_results(pending.pop(k))
+
 def run_pipeline(cfg, run_hyper=False):
     output_dir = create_output_dir(cfg)
+
+    # הפניית ההדפסות גם לקובץ לוג (עד סוף הריצה)
+    plots = cfg.get('execution', {}).get('plots', True)
+    with RunLogger(output_dir), PlotQueue(enabled=plots) as plot_queue:
+        _run_pipeline(cfg, output_dir, run_hyper, plot_queue)
+
+def _run_pipeline(cfg, output_dir, run_hyper, plot_queue):
     censored, uncensored = cfg['data_loaded']
-    
-    # הפניית ההדפסות גם לקובץ לוג
-    sys.stdout = Logger(os.path.join(output_dir, "run_log.txt"))
-    
+    n_jobs = cfg.get('execution', {}).get('n_jobs', 1)
+    bootstrap = cfg.get('bootstrap') or {}
+    n_resamples = bootstrap.get('n_resamples', 0)
+    permutations = cfg.get('permutations') or {}
+    n_permutations = permutations.get('n_permutations', 0)
+    result_cache = make_result_cache(cfg, (censored, uncensored))
+
     print(f">>> Output Directory: {output_dir}")
     print(f">>> Model Configuration: {cfg['model_params']}")
+    print(f">>> Workers (n_jobs): {resolve_n_jobs(n_jobs)}")
+    if result_cache is not None:
+        print(f">>> Fold cache: {result_cache.cache_dir}")
 
     if run_hyper:
         print("\n>>> MODE: Hyperparameter Search <<<")
-        k_values = cfg['hyperparameters']['k_values']
-        summary = []
-        
-        for k in k_values:
-            print(f"\n--- Testing feature_selection k={k} ---")
-            results_df = run_logo_cv(censored, uncensored, cfg['model_params'], k)
-            
-            if results_df is not None:
-                metrics = evaluate_and_plot(results_df, output_dir, file_prefix=f"results_k{k}")
-                metrics['k'] = k
-                summary.append(metrics)
-        
+        k_values = list(dict.fromkeys(cfg['hyperparameters']['k_values']))
+        print(f"Testing feature_selection k in {k_values}")
+        metrics_by_k = {}
+
+        with RunManifest(output_dir, (censored, uncensored), cfg['model_params']) as manifest:
+            for k, results_df in iter_logo_grid(censored, uncensored, cfg['model_params'], k_values,
+                                                n_jobs=n_jobs, result_cache=result_cache, manifest=manifest):
+                print(f"\n--- Finished feature_selection k={k} ---")
+
+                if results_df is not None:
+                    metrics = evaluate_and_plot(results_df, output_dir, file_prefix=f"results_k{k}",
+                                                plot_queue=plot_queue)
+                    if n_resamples:
+                        metrics.update(bootstrap_metrics(results_df, n_resamples,
+                                                         bootstrap.get('confidence', 0.95), bootstrap.get('seed', 42)))
+                    metrics['k'] = k
+                    metrics_by_k[k] = metrics
+
+        if n_permutations and metrics_by_k:
+            observed = {k: m['c_index'] for k, m in metrics_by_k.items()}
+            p_values = run_permutation_test(censored, uncensored, cfg['model_params'],
+                                            [k for k in k_values if k in metrics_by_k],
+                                            observed, output_dir, n_permutations,
+                                            n_jobs=n_jobs, seed=permutations.get('seed', 42))
+            for k, metrics in metrics_by_k.items():
+                metrics['p_permutation'] = p_values[k]
+
+        summary = [metrics_by_k[k] for k in k_values if k in metrics_by_k]
+
         # שמירת סיכום
         if summary:
             summary_df = pd.DataFrame(summary).sort_values(by="c_index", ascending=False)
@@ -120,9 +376,19 @@ def run_pipeline(cfg, run_hyper=False):
         k = cfg['model_params']['feature_selection']
         print(f"Running with k={k}")
         
-        results_df = run_logo_cv(censored, uncensored, cfg['model_params'], k)
+        results_df = run_logo_cv(censored, uncensored, cfg['model_params'], k,
+                                 n_jobs=n_jobs, result_cache=result_cache)
         
         if results_df is not None:
-            evaluate_and_plot(results_df, output_dir, file_prefix="final_results")
+            metrics = evaluate_and_plot(results_df, output_dir, file_prefix="final_results", plot_queue=plot_queue)
+            if n_resamples:
+                bootstrap_metrics(results_df, n_resamples, bootstrap.get('confidence', 0.95), bootstrap.get('seed', 42))
+            if n_permutations:
+                run_permutation_test(censored, uncensored, cfg['model_params'], [k], {k: metrics['c_index']},
+                                     output_dir, n_permutations, n_jobs=n_jobs, seed=permutations.get('seed', 42))
             results_df.to_csv(os.path.join(output_dir, "predictions.csv"))
-            print("Done.")
\ No newline at end of file
+            print("Done.")
+
+    if result_cache is not None:
+        removed = result_cache.evict()
+        print(f"Fold cache: {result_cache.hits} reused, {result_cache.misses} fitted, {removed} evicted.")
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from src.feature_ranking import frame_fingerprint, index_hash
+
+class FoldResultCache:
+    """
+    Content-addressed on-disk cache of LOGO fold predictions (one .npz per fold).
+    The key combines the loaded data, the model_params block and the fold itself
+    (LBL params for this k, train/test membership and the columns LBL sees).
+    """
+    def __init__(self, cache_dir, data, model_params, max_size_mb=None, max_age_days=None):
+        self.cache_dir = cache_dir
+        self.max_size_mb = max_size_mb
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+        censored, uncensored = data
+        h = hashlib.sha1()
+        h.update(frame_fingerprint(censored).encode())
+        h.update(frame_fingerprint(uncensored).encode())
+        # The k actually used by a fold is part of its LBL params, see key()
+        params = {k: v for k, v in model_params.items() if k != 'feature_selection'}
+        h.update(json.dumps(params, sort_keys=True, default=str).encode())
+        self.run_key = h.hexdigest()
+
+    def key(self, lbl_params, train, test, censored, target_col):
+        h = hashlib.sha1(self.run_key.encode())
+        h.update(json.dumps(lbl_params, sort_keys=True, default=str).encode())
+        h.update(index_hash(train.index).encode())
+        h.update(index_hash(test.index).encode())
+        h.update(index_hash(train.columns).encode())
+        h.update(target_col.encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def load(self, key, target_col):
+        path = self._path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+
+        with np.load(path, allow_pickle=False) as f:
+            fold_res = pd.DataFrame({target_col: f["target"]}, index=pd.Index(f["index"]))
+            fold_res["predicted_score"] = f["predicted_score"]
+            current_cage = str(f["cage"])
+        fold_res["Cage"] = current_cage
+
+        # Refresh mtime so eviction treats the entry as recently used
+        os.utime(path)
+        self.hits += 1
+        return current_cage, fold_res, None, 0.0
+
+    def store(self, key, result, target_col):
+        current_cage, fold_res, error, _ = result
+        if error is not None:
+            return
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f,
+                     index=fold_res.index.astype(str).to_numpy(dtype=str),
+                     target=fold_res[target_col].to_numpy(),
+                     predicted_score=np.asarray(fold_res["predicted_score"], dtype=float),
+                     cage=np.array(str(current_cage)))
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """
+        מוחק רשומות ישנות מ-max_age_days, ואז את הישנות ביותר עד שהגודל קטן מ-max_size_mb.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npz"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, path))
+
+        removed = 0
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+            for entry in [e for e in entries if e[0] < cutoff]:
+                os.remove(entry[2])
+                entries.remove(entry)
+                removed += 1
+
+        if self.max_size_mb is not None:
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            limit = self.max_size_mb * 1024 * 1024
+            while entries and total > limit:
+                _, size, path = entries.pop(0)
+                os.remove(path)
+                total -= size
+                removed += 1
+
+        return removed
+
+def make_result_cache(cfg, data):
+    cache_cfg = cfg.get('cache') or {}
+    if not cache_cfg.get('enabled', False):
+        return None
+
+    cache_dir = os.path.join(cfg['output_settings']['base_folder'], cache_cfg.get('folder', '.fold_cache'))
+    return FoldResultCache(cache_dir, data, cfg['model_params'],
+                           max_size_mb=cache_cfg.get('max_size_mb'),
+                           max_age_days=cache_cfg.get('max_age_days'))
@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# print() output of the pipeline, and per-fold timing records
+RUN_LOGGER = "ratio.run"
+FOLD_LOGGER = "ratio.folds"
+
+class _StdoutToLog(object):
+    """
+    File-like object that replaces sys.stdout during a run: complete lines are
+    sent to the run logger, a trailing partial line waits for its newline.
+    """
+    def __init__(self, logger):
+        self.logger = logger
+        self._partial = ""
+
+    def write(self, message):
+        lines = (self._partial + message).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self.logger.info(line)
+        return len(message)
+
+    def flush(self):
+        if self._partial:
+            self.logger.info(self._partial)
+            self._partial = ""
+
+class RunLogger(object):
+    """
+    Context manager for one pipeline run.
+    print() goes to the terminal and to run_log.txt, and records on the
+    "ratio.folds" logger go to fold_timings.jsonl. Callers only enqueue; a
+    background QueueListener thread does the writing. On exit stdout is
+    restored and the files are closed.
+    """
+    def __init__(self, output_dir, log_name="run_log.txt", timings_name="fold_timings.jsonl"):
+        self.log_path = os.path.join(output_dir, log_name)
+        self.timings_path = os.path.join(output_dir, timings_name)
+        self._listener = None
+
+    def __enter__(self):
+        self._terminal = sys.stdout
+        formatter = logging.Formatter("%(message)s")
+
+        terminal_handler = logging.StreamHandler(self._terminal)
+        file_handler = logging.FileHandler(self.log_path, mode="w")
+        timings_handler = logging.FileHandler(self.timings_path, mode="w")
+        for handler in (terminal_handler, file_handler, timings_handler):
+            handler.setFormatter(formatter)
+
+        # Route by logger name: prints to terminal + log, fold records to the JSON lines file
+        run_only = lambda record: record.name == RUN_LOGGER
+        terminal_handler.addFilter(run_only)
+        file_handler.addFilter(run_only)
+        timings_handler.addFilter(lambda record: record.name == FOLD_LOGGER)
+        self._handlers = [terminal_handler, file_handler, timings_handler]
+
+        log_queue = queue.SimpleQueue()
+        self._listener = QueueListener(log_queue, *self._handlers)
+        self._listener.start()
+
+        self._queue_handler = QueueHandler(log_queue)
+        for name in (RUN_LOGGER, FOLD_LOGGER):
+            logger = logging.getLogger(name)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(self._queue_handler)
+
+        self._stdout = _StdoutToLog(logging.getLogger(RUN_LOGGER))
+        sys.stdout = self._stdout
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stdout.flush()
+        sys.stdout = self._terminal
+
+        for name in (RUN_LOGGER, FOLD_LOGGER):
+            logging.getLogger(name).removeHandler(self._queue_handler)
+        # stop() drains the queue before the handlers are closed
+        self._listener.stop()
+        for handler in self._handlers:
+            handler.close()
+        return False
+
+def reset_worker_stdout():
+    # Pool initializer: prints inside a worker go straight to the terminal; the
+    # run logger lives in the parent process only
+    sys.stdout = sys.__stdout__
+
+def log_fold_timing(**record):
+    logging.getLogger(FOLD_LOGGER).info(json.dumps(record, default=str))
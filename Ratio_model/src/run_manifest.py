@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import pandas as pd
+
+from src.feature_ranking import frame_fingerprint
+
+def read_jsonl_records(path):
+    """
+    The records of an append-only JSON lines file, [] if it does not exist.
+    A run killed mid-write leaves at most one partial line at the end; it is
+    cut from the file, so the next record starts on a line of its own.
+    """
+    records = []
+    if not os.path.exists(path):
+        return records
+    end = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            end = f.tell()
+    os.truncate(path, end)
+    return records
+
+class RunManifest:
+    """
+    Append-only JSON lines record of the finished (k, fold) cells of a --hyper
+    run, kept in the output folder. The first line holds a key of the data and
+    model_params; a restart with the same key skips every cell already in the
+    file, a different key starts a new manifest.
+    Failed folds are not recorded, so they are retried on restart.
+    """
+    def __init__(self, output_dir, data, model_params, name="hyper_manifest.jsonl"):
+        self.path = os.path.join(output_dir, name)
+        censored, uncensored = data
+        h = hashlib.sha1()
+        h.update(frame_fingerprint(censored).encode())
+        h.update(frame_fingerprint(uncensored).encode())
+        # k comes from the grid, not from feature_selection
+        params = {k: v for k, v in model_params.items() if k != 'feature_selection'}
+        h.update(json.dumps(params, sort_keys=True, default=str).encode())
+        self.run_key = h.hexdigest()
+
+        self.cells = self._load()
+        mode = "a" if self.cells is not None else "w"
+        if self.cells is None:
+            self.cells = {}
+        self._file = open(self.path, mode)
+        if mode == "w":
+            self._write({"run_key": self.run_key})
+
+    def _load(self):
+        # None = no usable manifest (missing, or written for another config)
+        records = read_jsonl_records(self.path)
+        if not records:
+            return None
+        if records[0].get("run_key") != self.run_key:
+            print(f"Manifest {self.path} belongs to another config, starting over")
+            return None
+        return {(record["k"], record["fold"]): record for record in records[1:]}
+
+    def _write(self, record):
+        # One write per line + fsync, so a crash never leaves a half-recorded cell behind
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def __contains__(self, key):
+        return key in self.cells
+
+    def load(self, key, target_col):
+        """
+        Returns the fit_fold-style result recorded for (k, fold).
+        """
+        record = self.cells[key]
+        fold_res = pd.DataFrame({target_col: record["target"]}, index=pd.Index(record["index"]))
+        fold_res["predicted_score"] = record["predicted_score"]
+        fold_res["Cage"] = record["cage"]
+        return record["cage"], fold_res, None, 0.0
+
+    def record(self, key, result, target_col):
+        current_cage, fold_res, error, seconds = result
+        if error is not None:
+            return
+        k, fold = key
+        record = {
+            "k": k, "fold": fold, "cage": str(current_cage), "seconds": round(seconds, 4),
+            "index": fold_res.index.astype(str).tolist(),
+            "target": fold_res[target_col].astype(float).tolist(),
+            "predicted_score": fold_res["predicted_score"].astype(float).tolist(),
+        }
+        self.cells[key] = record
+        self._write(record)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
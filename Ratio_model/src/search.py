@@ -0,0 +1,206 @@
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import GroupShuffleSplit
+
+from src.evaluation import calculate_concordance_index, compute_metrics
+from src.feature_ranking import RankingCache, feature_columns
+from src.logo_ridge import LogoRidge
+from src.pipeline import (create_output_dir, fit_fold, make_fold_task, make_ranking_cache,
+                          resolve_n_jobs, run_logo_cv)
+from src.run_logger import RunLogger, reset_worker_stdout
+
+STRATEGIES = ("grid", "random", "halving")
+
+def grid_trials(space):
+    """
+    כל הצירופים של ערכי ה-space (כל ערך חייב להיות רשימה).
+    """
+    for key, values in space.items():
+        if not isinstance(values, list):
+            raise ValueError(f"Grid search needs a list of values for '{key}', got {values!r}")
+    keys = list(space)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(space[k] for k in keys))]
+
+def _sample_value(spec, rng):
+    if isinstance(spec, list):
+        return spec[rng.integers(len(spec))]
+    low, high = spec['low'], spec['high']
+    if spec.get('log', False):
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    if isinstance(low, int) and isinstance(high, int):
+        return int(round(value))
+    return float(value)
+
+def random_trials(space, n_trials, seed=42):
+    """
+    דוגם n_trials קונפיגורציות שונות מה-space.
+    A list is a set of choices, {low, high[, log]} a uniform (or log-uniform)
+    range; ranges with integer bounds give integers. Duplicate draws are
+    dropped, so small spaces can yield fewer trials.
+    """
+    rng = np.random.default_rng(seed)
+    trials = {}
+    for _ in range(n_trials * 10):
+        if len(trials) == n_trials:
+            break
+        trial = {key: _sample_value(spec, rng) for key, spec in space.items()}
+        trials.setdefault(json.dumps(trial, sort_keys=True), trial)
+    return list(trials.values())
+
+def score_trial_splits(censored, uncensored, params, splits):
+    """
+    Cheap screening of one configuration: fits on each (train_idx, test_idx)
+    split of the uncensored samples and returns the mean C-index over the
+    splits (None if every split failed).
+    """
+    target_col = params['target_col']
+    k = params['feature_selection']
+    scores = []
+
+    if params.get('cv_backend', 'lbl') == 'ridge_gram':
+        cols = feature_columns(uncensored, params['num_of_bact'])
+        col_idx = {c: i for i, c in enumerate(cols)}
+        engine = LogoRidge(uncensored[cols].to_numpy(dtype=float), uncensored[target_col].to_numpy(), params['alpha'])
+        ranking_cache = RankingCache(uncensored, cols, target_col)
+        for train_idx, test_idx in splits:
+            selected = ranking_cache.top_features(uncensored.iloc[train_idx], k)
+            preds = engine.predict_held_out(test_idx, [col_idx[c] for c in selected])
+            scores.append(calculate_concordance_index(uncensored[target_col].values[test_idx], preds))
+    else:
+        ranking_cache = make_ranking_cache(uncensored, params)
+        for train_idx, test_idx in splits:
+            task = make_fold_task(params, k, uncensored.iloc[train_idx], uncensored.iloc[test_idx],
+                                  censored, ranking_cache)
+            _, fold_res, error, _ = fit_fold(*task)
+            if error is None:
+                scores.append(calculate_concordance_index(fold_res[target_col].values,
+                                                          fold_res["predicted_score"].values))
+
+    scores = [s for s in scores if not np.isnan(s)]
+    return float(np.mean(scores)) if scores else None
+
+def run_trial_logo(censored, uncensored, params):
+    # Full LOGO of one configuration; the folds run sequentially inside the trial
+    return run_logo_cv(censored, uncensored, params, params['feature_selection'])
+
+def _map_trials(func, trial_args, n_jobs):
+    """
+    Runs func(*args) for every entry of trial_args, sequentially or on a process
+    pool. Yields (position, result); a trial that raises yields None.
+    """
+    n_jobs = min(resolve_n_jobs(n_jobs), max(1, len(trial_args)))
+    if n_jobs == 1:
+        for i, args in enumerate(trial_args):
+            try:
+                yield i, func(*args)
+            except Exception as e:
+                print(f"Error in trial: {e}")
+                yield i, None
+        return
+
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=reset_worker_stdout) as pool:
+        futures = {pool.submit(func, *args): i for i, args in enumerate(trial_args)}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                print(f"Error in trial: {e}")
+                yield futures[future], None
+
+def successive_halving(censored, uncensored, model_params, trials, rows, n_jobs=1,
+                       factor=3, n_splits=5, test_size=0.2, seed=42):
+    """
+    מסנן קונפיגורציות על חלוקות אקראיות זולות לפני LOGO מלא.
+    Each rung scores the surviving trials on n_splits GroupShuffleSplit splits
+    (by cage) and keeps the best 1/factor of them; the next rung uses factor
+    times more splits. Stops once at most `factor` trials remain or a rung
+    would need as many splits as there are cages. Returns the surviving trial
+    numbers; the screening scores are written into rows.
+    """
+    candidates = list(range(len(trials)))
+    n_groups = uncensored["Cage"].nunique()
+    rung = 0
+    while len(candidates) > factor and n_splits < n_groups:
+        splitter = GroupShuffleSplit(n_splits=n_splits, test_size=test_size, random_state=seed + rung)
+        splits = list(splitter.split(uncensored, groups=uncensored["Cage"]))
+        print(f"\n--- Rung {rung}: {len(candidates)} trials on {n_splits} random splits ---")
+
+        args = [(censored, uncensored, {**model_params, **trials[t]}, splits) for t in candidates]
+        for pos, score in _map_trials(score_trial_splits, args, n_jobs):
+            t = candidates[pos]
+            rows[t].update(rung=rung, n_splits=n_splits, screen_c_index=score)
+            print(f"  trial {t}: {trials[t]} -> screening C-Index {score}")
+
+        # Failed trials rank last
+        candidates.sort(key=lambda t: -np.inf if rows[t]['screen_c_index'] is None else rows[t]['screen_c_index'],
+                        reverse=True)
+        candidates = candidates[:max(1, math.ceil(len(candidates) / factor))]
+        n_splits *= factor
+        rung += 1
+    return candidates
+
+def run_search(cfg):
+    output_dir = create_output_dir(cfg)
+    with RunLogger(output_dir):
+        return _run_search(cfg, output_dir)
+
+def _run_search(cfg, output_dir):
+    censored, uncensored = cfg['data_loaded']
+    search = cfg.get('search') or {}
+    strategy = search.get('strategy', 'grid')
+    space = search.get('space') or {}
+    seed = search.get('seed', 42)
+    n_jobs = cfg.get('execution', {}).get('n_jobs', 1)
+    model_params = cfg['model_params']
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown search strategy '{strategy}', expected one of {STRATEGIES}")
+    unknown = [key for key in space if key not in model_params]
+    if unknown:
+        raise ValueError(f"Search space keys not in model_params: {unknown}")
+
+    if strategy == "grid":
+        trials = grid_trials(space)
+    else:
+        trials = random_trials(space, search.get('n_trials', 20), seed)
+
+    print(f">>> Output Directory: {output_dir}")
+    print(f">>> MODE: {strategy} search over {list(space)}, {len(trials)} trials <<<")
+    print(f">>> Workers (n_jobs): {resolve_n_jobs(n_jobs)}")
+
+    rows = [{'trial': t, **trial} for t, trial in enumerate(trials)]
+    finalists = list(range(len(trials)))
+    if strategy == "halving":
+        halving = search.get('halving') or {}
+        finalists = successive_halving(censored, uncensored, model_params, trials, rows, n_jobs=n_jobs,
+                                       factor=halving.get('factor', 3), n_splits=halving.get('n_splits', 5),
+                                       test_size=halving.get('test_size', 0.2), seed=seed)
+
+    print(f"\n--- Full LOGO for {len(finalists)} trials ---")
+    args = [(censored, uncensored, {**model_params, **trials[t]}) for t in finalists]
+    for pos, results_df in _map_trials(run_trial_logo, args, n_jobs):
+        t = finalists[pos]
+        if results_df is not None:
+            rows[t].update(compute_metrics(results_df, f"trial {t}: {trials[t]}"))
+
+    leaderboard = pd.DataFrame(rows)
+    for col in ("c_index", "screen_c_index"):
+        if col not in leaderboard:
+            leaderboard[col] = np.nan
+    # Trials with a full LOGO score first, then the screened-out ones by screening score
+    leaderboard = leaderboard.sort_values(by=["c_index", "screen_c_index"], ascending=False, na_position="last")
+    leaderboard.insert(0, "rank", range(1, len(leaderboard) + 1))
+
+    leaderboard_path = os.path.join(output_dir, "search_leaderboard.csv")
+    leaderboard.to_csv(leaderboard_path, index=False)
+    print("\n=== Search Leaderboard ===")
+    print(leaderboard.head(10).to_string(index=False))
+    print(f"Saved to {leaderboard_path}")
+    return leaderboard
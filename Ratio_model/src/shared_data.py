@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+# RAM-backed tmpfs when available, so the memory-mapped blocks never touch disk
+SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+class SharedFrame:
+    """
+    A DataFrame split into its numeric feature block, saved once as a .npy file
+    that every worker memory-maps read-only, and the remaining (metadata) columns
+    (Cage, MiceName, AgeMonths, diff, ...), which are pickled with the object.
+    take() rebuilds any row/feature subset in the original column order.
+    """
+    def __init__(self, df, feature_cols, path):
+        self.path = path
+        self.index = df.index
+        self.columns = df.columns
+        self.feature_cols = list(feature_cols)
+        self.meta = df.drop(columns=self.feature_cols)
+        np.save(path, df[self.feature_cols].to_numpy())
+        self._block = None
+        self._positions = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_block'] = None
+        state['_positions'] = None
+        return state
+
+    @property
+    def block(self):
+        # Zero-copy view of the shared file, opened on first use in each process
+        if self._block is None:
+            self._block = np.load(self.path, mmap_mode='r')
+        return self._block
+
+    def feature_positions(self, features):
+        if self._positions is None:
+            self._positions = {c: i for i, c in enumerate(self.feature_cols)}
+        return [self._positions[c] for c in features]
+
+    def take(self, rows=None, features=None):
+        """
+        rows: positions (None = all), features: feature names (None = all).
+        Returns a new DataFrame: the features first, then the metadata columns.
+        """
+        rows = np.arange(len(self.index)) if rows is None else np.asarray(rows)
+        if features is None:
+            features = self.feature_cols
+            values = self.block[rows]
+        else:
+            values = self.block[np.ix_(rows, self.feature_positions(features))]
+        df = pd.DataFrame(values, index=self.index[rows], columns=list(features))
+        return pd.concat([df, self.meta.iloc[rows]], axis=1)
+
+def _can_share(df, feature_cols):
+    # One numeric dtype for the whole block, so the round trip keeps every column's dtype
+    dtypes = set(df.dtypes[feature_cols])
+    return df.index.is_unique and len(dtypes) == 1 and np.issubdtype(dtypes.pop(), np.number)
+
+class SharedDataset:
+    """
+    The censored and uncensored frames of a run as SharedFrames, plus the
+    conversion of a fold task into row positions and feature names, so that a
+    task sent to a worker no longer depends on the number of features.
+    """
+    def __init__(self, censored, uncensored, num_of_bact, folder):
+        self.folder = folder
+        self.censored = SharedFrame(censored, censored.columns[:num_of_bact], os.path.join(folder, "censored.npy"))
+        self.uncensored = SharedFrame(uncensored, uncensored.columns[:num_of_bact], os.path.join(folder, "uncensored.npy"))
+
+    def task_ref(self, task):
+        """
+        (lbl_params, train, test, censored, target_col) ->
+        (lbl_params, train_rows, test_rows, selected features or None, target_col)
+        """
+        lbl_params, train, test, censored, target_col = task
+        selected = None
+        if not train.columns.equals(self.uncensored.columns):
+            # Pruned to the ranked top-k, see make_fold_task
+            feature_set = set(self.uncensored.feature_cols)
+            selected = [c for c in train.columns if c in feature_set]
+        return (lbl_params, self.uncensored.index.get_indexer(train.index),
+                self.uncensored.index.get_indexer(test.index), selected, target_col)
+
+    def task_frames(self, lbl_params, train_rows, test_rows, selected, target_col):
+        # The inverse of task_ref, run in the worker
+        return (lbl_params, self.uncensored.take(train_rows, selected), self.uncensored.take(test_rows, selected),
+                self.censored.take(None, selected), target_col)
+
+    def close(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+@contextmanager
+def shared_dataset(censored, uncensored, num_of_bact, enabled=True):
+    """
+    Yields a SharedDataset for the duration of a parallel run and removes its
+    files afterwards. Yields None when disabled or when the frames cannot be
+    shared exactly (mixed or non-numeric feature dtypes, duplicate sample
+    names, different feature blocks); callers then send the frames themselves.
+    """
+    feature_cols = uncensored.columns[:num_of_bact]
+    if not enabled or not (censored.columns[:num_of_bact].equals(feature_cols)
+                           and _can_share(censored, feature_cols) and _can_share(uncensored, feature_cols)):
+        yield None
+        return
+
+    dataset = SharedDataset(censored, uncensored, num_of_bact, tempfile.mkdtemp(prefix="ratio_shared_", dir=SHARED_DIR))
+    try:
+        yield dataset
+    finally:
+        dataset.close()
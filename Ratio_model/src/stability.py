@@ -0,0 +1,154 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from src.feature_ranking import feature_columns, spearman_correlations
+from src.pipeline import create_output_dir, logo_splits, resolve_n_jobs
+from src.run_logger import RunLogger, reset_worker_stdout
+
+def top_k_positions(X, y, k):
+    """
+    Positions of the k columns of X with the largest |Spearman| against y, in
+    the same order as rank_features (stable, undefined correlations last).
+    """
+    strength = np.abs(spearman_correlations(X, y)["coef"].to_numpy())
+    order = np.argsort(np.where(np.isnan(strength), np.inf, -strength), kind="stable")
+    return order[:k]
+
+def standardized_ridge(X, y, alpha):
+    """
+    Coefficients of StandardScaler + Ridge(alpha) (with intercept), solved
+    directly on the k x k system. Constant columns are left unscaled, as in
+    StandardScaler. A singular system (alpha 0 with constant or duplicate
+    columns) gets the minimum-norm least squares solution.
+    """
+    mean = X.mean(axis=0)
+    scale = X.std(axis=0)
+    scale[scale < 10 * np.finfo(float).eps] = 1.0
+    Z = (X - mean) / scale
+    A, b = Z.T @ Z + alpha * np.eye(Z.shape[1]), Z.T @ (y - y.mean())
+    try:
+        return np.linalg.solve(A, b)
+    except np.linalg.LinAlgError:
+        return np.linalg.lstsq(A, b, rcond=None)[0]
+
+def fit_rows(X, y, row_sets, k, alpha):
+    """
+    מאמן rank + Ridge על כל קבוצת שורות.
+    Returns (selected, coefs), both (len(row_sets), k): the selected feature
+    positions of every fit and their standardized Ridge coefficients.
+    """
+    selected = np.empty((len(row_sets), k), dtype=int)
+    coefs = np.empty((len(row_sets), k))
+    for i, rows in enumerate(row_sets):
+        X_fit, y_fit = X[rows], y[rows]
+        selected[i] = top_k_positions(X_fit, y_fit, k)
+        coefs[i] = standardized_ridge(X_fit[:, selected[i]], y_fit, alpha)
+    return selected, coefs
+
+def bootstrap_row_sets(groups, n_resamples, seed=42):
+    """
+    Cage-level bootstrap: each resample draws as many cages as there are, with
+    replacement, and keeps every sample of each drawn cage (repeated cages repeat
+    their samples).
+    """
+    rng = np.random.default_rng(seed)
+    cages, codes = np.unique(np.asarray(groups), return_inverse=True)
+    members = [np.flatnonzero(codes == c) for c in range(len(cages))]
+    draws = rng.integers(len(cages), size=(n_resamples, len(cages)))
+    return [np.concatenate([members[c] for c in draw]) for draw in draws]
+
+def coefficient_stability(uncensored, params, k, n_resamples=500, seed=42, n_jobs=1):
+    """
+    Refits the |Spearman| top-k + standardized Ridge model on every LOGO training
+    fold (the partition of run_logo_cv) and on n_resamples cage-level bootstrap
+    resamples of the uncensored samples.
+    Returns (draws, summary): draws has one row per (fit, selected feature);
+    summary has per feature the selection frequency over the LOGO folds and
+    over the bootstrap resamples, the coefficient distribution over the
+    bootstrap fits, and the coefficient of the fit on all samples.
+    """
+    cols = feature_columns(uncensored, params['num_of_bact'])
+    X = uncensored[cols].to_numpy(dtype=float)
+    y = uncensored[params['target_col']].to_numpy(dtype=float)
+    alpha = params['alpha']
+    k = min(k, len(cols))
+
+    row_sets = [np.arange(len(y))]
+    row_sets += [train_idx for train_idx, _ in logo_splits(uncensored)]
+    n_logo = len(row_sets) - 1
+    row_sets += bootstrap_row_sets(uncensored["Cage"], n_resamples, seed)
+    sources = ["full"] + ["logo"] * n_logo + ["bootstrap"] * n_resamples
+
+    n_jobs = min(resolve_n_jobs(n_jobs), len(row_sets))
+    if n_jobs == 1:
+        selected, coefs = fit_rows(X, y, row_sets, k, alpha)
+    else:
+        # Contiguous chunks, one per worker; X is sent once per chunk
+        chunks = np.array_split(np.arange(len(row_sets)), n_jobs)
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=reset_worker_stdout) as pool:
+            parts = list(pool.map(fit_rows, [X] * n_jobs, [y] * n_jobs,
+                                  [[row_sets[i] for i in chunk] for chunk in chunks],
+                                  [k] * n_jobs, [alpha] * n_jobs))
+        selected = np.concatenate([p[0] for p in parts])
+        coefs = np.concatenate([p[1] for p in parts])
+
+    draws = pd.DataFrame({
+        "fit": np.repeat(np.arange(len(row_sets)), k),
+        "source": np.repeat(sources, k),
+        "feature": np.asarray(cols, dtype=object)[selected.ravel()],
+        "coefficient": coefs.ravel(),
+    })
+
+    full = draws[draws["source"] == "full"].set_index("feature")["coefficient"]
+    logo = draws[draws["source"] == "logo"].groupby("feature")["coefficient"]
+    boot = draws[draws["source"] == "bootstrap"].groupby("feature")["coefficient"]
+
+    summary = pd.DataFrame(index=pd.Index(draws["feature"].unique(), name="feature"))
+    summary["full_data_coef"] = full
+    summary["logo_frequency"] = logo.size() / max(n_logo, 1)
+    summary["logo_coef_mean"] = logo.mean()
+    if n_resamples:
+        summary["bootstrap_frequency"] = boot.size() / n_resamples
+        summary["coef_mean"] = boot.mean()
+        summary["coef_std"] = boot.std()
+        summary["coef_median"] = boot.median()
+        summary["coef_ci_low"] = boot.quantile(0.025)
+        summary["coef_ci_high"] = boot.quantile(0.975)
+        # Share of the bootstrap fits that agree with the sign of the median coefficient
+        summary["sign_consistency"] = draws[draws["source"] == "bootstrap"].assign(
+            positive=lambda d: d["coefficient"] > 0).groupby("feature")["positive"].mean()
+        summary["sign_consistency"] = np.where(summary["coef_median"] > 0, summary["sign_consistency"],
+                                               1 - summary["sign_consistency"])
+    summary = summary.fillna({"logo_frequency": 0.0, "bootstrap_frequency": 0.0})
+    sort_cols = ["bootstrap_frequency", "logo_frequency"] if n_resamples else ["logo_frequency"]
+    summary = summary.sort_values(by=sort_cols, ascending=False, kind="mergesort")
+    return draws, summary.reset_index()
+
+def run_stability(cfg):
+    output_dir = create_output_dir(cfg)
+    with RunLogger(output_dir):
+        return _run_stability(cfg, output_dir)
+
+def _run_stability(cfg, output_dir):
+    _, uncensored = cfg['data_loaded']
+    params = cfg['model_params']
+    stability = cfg.get('stability') or {}
+    n_resamples = stability.get('n_resamples', 500)
+    k = params['feature_selection']
+    n_jobs = cfg.get('execution', {}).get('n_jobs', 1)
+
+    print(f">>> Output Directory: {output_dir}")
+    print(f">>> MODE: Coefficient stability, k={k}, alpha={params['alpha']}, "
+          f"LOGO folds + {n_resamples} cage bootstrap resamples <<<")
+
+    draws, summary = coefficient_stability(uncensored, params, k, n_resamples=n_resamples,
+                                           seed=stability.get('seed', 42), n_jobs=n_jobs)
+
+    summary_path = os.path.join(output_dir, f"coef_stability_k{k}.csv")
+    summary.to_csv(summary_path, index=False)
+    draws.to_csv(os.path.join(output_dir, f"coef_draws_k{k}.csv"), index=False)
+    print(summary.head(max(k, 10)).to_string(index=False))
+    print(f"Saved to {summary_path}")
+    return summary
@@ -0,0 +1,161 @@
+import io
+import shutil
+import tempfile
+import zipfile
+import h5py
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Rows read from the HDF5 file at a time by iter_features / iter_samples
+CHUNK_ROWS = 5000
+
+def _decode(values):
+    # h5py 2.x returns vlen strings as str, h5py 3.x as bytes
+    return np.array([v.decode() if isinstance(v, bytes) else v for v in values], dtype=object)
+
+def _qza_member(archive, suffix):
+    """
+    The path inside a QIIME2 .qza of its data file, <uuid>/data/<suffix>.
+    """
+    for name in archive.namelist():
+        if name.endswith(f"/data/{suffix}"):
+            return name
+    raise ValueError(f"{archive.filename} has no data/{suffix} (not a FeatureTable / FeatureData[Taxonomy] artifact?)")
+
+class BiomTable:
+    """
+    קורא טבלת BIOM 2.x (HDF5) ישירות, בלי export לטקסט.
+    Opens a .biom file, or the feature-table.biom of a QIIME2 FeatureTable .qza
+    (extracted once as is to a temporary folder; the archive is zipped, so it
+    cannot be read in place). Only the IDs and the row pointers are read up
+    front; counts are read on demand, by feature (the observation CSR block of
+    the file) or by sample (the sample CSR block), with the values stored in
+    the file (no float to text round trip).
+    Use as a context manager, or call close().
+    """
+    def __init__(self, path):
+        path = str(path)
+        self.path = path
+        self._tmp_dir = None
+        if path.endswith(".qza"):
+            self._tmp_dir = tempfile.mkdtemp(prefix="biom_")
+            with zipfile.ZipFile(path) as archive:
+                path = archive.extract(_qza_member(archive, "feature-table.biom"), self._tmp_dir)
+        try:
+            self._file = h5py.File(path, "r")
+        except Exception:
+            self.close()
+            raise
+        self.feature_ids = pd.Index(_decode(self._file["observation/ids"][()]), name="FeatureID")
+        self.sample_ids = pd.Index(_decode(self._file["sample/ids"][()]), name="ID")
+        self._indptr = {"observation": self._file["observation/matrix/indptr"][()],
+                        "sample": self._file["sample/matrix/indptr"][()]}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+    @property
+    def shape(self):
+        return len(self.feature_ids), len(self.sample_ids)
+
+    @property
+    def nnz(self):
+        return int(self._indptr["observation"][-1])
+
+    def _read_rows(self, axis, positions):
+        """
+        CSR block of the given rows of the observation (features x samples) or
+        sample (samples x features) matrix. A contiguous run is one read per
+        dataset; other rows are read one range each.
+        """
+        matrix = self._file[f"{axis}/matrix"]
+        indptr = self._indptr[axis]
+        n_cols = self.shape[1] if axis == "observation" else self.shape[0]
+        positions = np.asarray(positions, dtype=np.int64)
+        starts, stops = indptr[positions], indptr[positions + 1]
+
+        if len(positions) and np.array_equal(positions, np.arange(positions[0], positions[0] + len(positions))):
+            data = matrix["data"][starts[0]:stops[-1]]
+            indices = matrix["indices"][starts[0]:stops[-1]]
+        else:
+            data = np.concatenate([matrix["data"][a:b] for a, b in zip(starts, stops)] or [np.empty(0)])
+            indices = np.concatenate([matrix["indices"][a:b] for a, b in zip(starts, stops)] or [np.empty(0, int)])
+        row_ptr = np.concatenate([[0], np.cumsum(stops - starts)])
+        return sparse.csr_matrix((data, indices, row_ptr), shape=(len(positions), n_cols))
+
+    def _positions(self, index, ids):
+        positions = index.get_indexer(pd.Index(ids).astype(str))
+        if (positions < 0).any():
+            missing = pd.Index(ids)[positions < 0]
+            raise KeyError(f"{len(missing)} IDs not in {self.path}: {list(missing[:5])}")
+        return positions
+
+    def feature_counts(self, feature_ids):
+        """
+        CSR (len(feature_ids) x samples) with the counts of those features only.
+        """
+        return self._read_rows("observation", self._positions(self.feature_ids, feature_ids))
+
+    def sample_counts(self, sample_ids):
+        """
+        CSR (len(sample_ids) x features) with the counts of those samples only.
+        """
+        return self._read_rows("sample", self._positions(self.sample_ids, sample_ids))
+
+    def iter_features(self, chunk_rows=CHUNK_ROWS):
+        # Yields (feature_ids, CSR chunk x samples)
+        for start in range(0, self.shape[0], chunk_rows):
+            stop = min(start + chunk_rows, self.shape[0])
+            yield self.feature_ids[start:stop], self._read_rows("observation", np.arange(start, stop))
+
+    def iter_samples(self, chunk_rows=CHUNK_ROWS):
+        # Yields (sample_ids, CSR chunk x features)
+        for start in range(0, self.shape[1], chunk_rows):
+            stop = min(start + chunk_rows, self.shape[1])
+            yield self.sample_ids[start:stop], self._read_rows("sample", np.arange(start, stop))
+
+    def to_sparse(self):
+        """
+        The whole table as CSR, features x samples.
+        """
+        return self._read_rows("observation", np.arange(self.shape[0]))
+
+    def taxonomy(self):
+        """
+        The 'taxonomy' observation metadata as a Taxon column ("k__...; p__..."),
+        or None when the table has none (QIIME2 keeps it in a separate artifact).
+        """
+        if "observation/metadata/taxonomy" not in self._file:
+            return None
+        levels = self._file["observation/metadata/taxonomy"][()]
+        if levels.ndim == 1:
+            taxa = _decode(levels)
+        else:
+            # Rows are padded with "" to the longest lineage
+            taxa = ["; ".join(level for level in _decode(row) if level) for row in levels]
+        return pd.DataFrame({"Taxon": taxa}, index=self.feature_ids)
+
+def read_qza_taxonomy(path):
+    """
+    Taxonomy (Taxon, Confidence) indexed by FeatureID from a QIIME2
+    FeatureData[Taxonomy] .qza (its data/taxonomy.tsv).
+    """
+    with zipfile.ZipFile(path) as archive:
+        text = archive.read(_qza_member(archive, "taxonomy.tsv")).decode()
+    tax = pd.read_csv(io.StringIO(text), sep="\t", index_col=0)
+    # Drop the optional '#q2:types' directive row
+    tax = tax[~tax.index.astype(str).str.startswith("#q2:")]
+    tax.index = tax.index.astype(str).rename("FeatureID")
+    if "Confidence" in tax.columns:
+        tax["Confidence"] = pd.to_numeric(tax["Confidence"], errors="coerce")
+    return tax
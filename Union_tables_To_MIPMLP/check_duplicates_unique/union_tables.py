@@ -1,5 +1,9 @@
-import pandas as pd
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feature_table import FeatureTable
 
 # === הגדרת נתיבים ===
 # וודא שהשמות תואמים בדיוק למה שיש לך בתיקייה
@@ -17,45 +21,25 @@ if not os.path.exists(output_dir):
     print(f"Creating directory: {output_dir}")
     os.makedirs(output_dir)
 
-print("Loading OTU table...")
+# === ביצוע האיחוד (Join) ===
+# העמודה הראשונה בשני הקבצים היא ה-FeatureID, מה ששמה
+# 'inner' join - שומרים רק שורות שקיימות בשני הקבצים (בדרך כלל הם זהים ב-100%)
+print("Loading OTU and Taxonomy tables and merging them on FeatureID...")
 try:
-    # קריאת קובץ ה-OTU (מדלגים על שורה ראשונה אם היא הערה של biom)
-    otu_df = pd.read_csv(otu_path, header=0)
-    
-    # אחידות: משנים את שם העמודה הראשונה (ה-ID) לשם קבוע כדי למנוע בלבול
-    otu_df.rename(columns={otu_df.columns[0]: 'FeatureID'}, inplace=True)
-    print(f"OTU Table loaded: {otu_df.shape[0]} rows, {otu_df.shape[1]} columns")
-
+    table = FeatureTable.from_exports(otu_path, tax_path)
 except Exception as e:
-    print(f"Error loading OTU file: {e}")
-    exit(1)
-
-print("Loading Taxonomy table...")
-try:
-    # קריאת קובץ הטקסונומיה
-    tax_df = pd.read_csv(tax_path, header=0)
-    
-    # אחידות: משנים גם כאן את העמודה הראשונה ל-FeatureID
-    tax_df.rename(columns={tax_df.columns[0]: 'FeatureID'}, inplace=True)
-    print(f"Taxonomy Table loaded: {tax_df.shape[0]} rows")
-
-except Exception as e:
-    print(f"Error loading Taxonomy file: {e}")
+    print(f"Error loading tables: {e}")
     print("Tip: Check if the file is named 'taxonomy.tsv' or lies inside a folder.")
     exit(1)
 
-# === ביצוע האיחוד (Merge) ===
-print("Merging tables based on FeatureID...")
-
-# אנחנו עושים 'inner' join כדי לשמור רק שורות שקיימות בשני הקבצים
-# (בדרך כלל הם זהים ב-100%)
-merged_df = pd.merge(otu_df, tax_df, on='FeatureID', how='inner')
-
-# === שמירה ===
+# === שמירה (בחלקים, ישר מהמטריצה הדלילה) ===
 output_path = os.path.join(output_dir, output_filename)
-merged_df.to_csv(output_path, index=False)
+table.write_merged(output_path)
+# אותה טבלה בפורמט דליל (CSR .npz + קבצי features/samples)
+sparse_path = table.save_npz(os.path.splitext(output_path)[0] + ".npz")
 
 print("-" * 30)
 print(f"DONE! Merged file saved to:\n{output_path}")
-print(f"Final shape: {merged_df.shape[0]} rows, {merged_df.shape[1]} columns")
-print("-" * 30)
\ No newline at end of file
+print(f"Sparse copy saved to:\n{sparse_path}")
+print(f"Final shape: {table.shape[0]} rows, {1 + table.shape[1] + table.taxonomy.shape[1]} columns")
+print("-" * 30)
@@ -0,0 +1,185 @@
+import csv
+import os
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Rows parsed from otu.csv / written to the output CSVs at a time
+CHUNK_ROWS = 5000
+
+def as_integer_counts(counts):
+    # int64 when every stored value is integral, as in read count tables
+    if np.array_equal(counts.data, np.round(counts.data)):
+        return counts.astype(np.int64)
+    return counts
+
+def read_counts(otu_path, chunk_rows=CHUNK_ROWS):
+    """
+    קורא את טבלת ה-OTU (ASVs בשורות, דגימות בעמודות) בחלקים.
+    Each chunk is converted to a sparse matrix right away, so the dense table
+    never exists in memory as a whole. The counts are stored as int64 when
+    every value is integral (as exported from the BIOM table), else float64.
+    Returns (counts CSR features x samples, feature_ids, sample_ids).
+    """
+    blocks, feature_ids = [], []
+    sample_ids = None
+    for chunk in pd.read_csv(otu_path, index_col=0, chunksize=chunk_rows):
+        sample_ids = chunk.columns
+        feature_ids.append(chunk.index.astype(str))
+        blocks.append(sparse.csr_matrix(chunk.to_numpy(dtype=float)))
+    if sample_ids is None:
+        raise ValueError(f"{otu_path} has no feature rows")
+
+    counts = as_integer_counts(sparse.vstack(blocks, format="csr"))
+    return counts, pd.Index(np.concatenate(feature_ids), name="FeatureID"), pd.Index(sample_ids)
+
+def sparse_files(npz_path):
+    """
+    The files of a table saved with FeatureTable.save_npz: the CSR counts and
+    the row (features + taxonomy) and column (samples) sidecars.
+    """
+    stem = npz_path[:-len(".npz")] if npz_path.endswith(".npz") else npz_path
+    return stem + ".npz", stem + ".features.csv", stem + ".samples.csv"
+
+def read_taxonomy_table(taxonomy_path):
+    """
+    Taxonomy (Taxon, Confidence, ...) indexed by FeatureID, from a .csv / .tsv
+    export or a FeatureData[Taxonomy] .qza.
+    The first column is the feature ID whatever its header ('Feature ID', '#OTU ID', ...).
+    """
+    taxonomy_path = str(taxonomy_path)
+    if taxonomy_path.endswith(".qza"):
+        from biom_reader import read_qza_taxonomy
+        return read_qza_taxonomy(taxonomy_path)
+    tax = pd.read_csv(taxonomy_path, index_col=0, sep="\t" if taxonomy_path.endswith(".tsv") else ",")
+    tax.index = tax.index.astype(str).rename("FeatureID")
+    return tax
+
+class FeatureTable:
+    """
+    טבלת ה-OTU המאוחדת עם הטקסונומיה.
+    counts: sparse CSR, features x samples; taxonomy: DataFrame indexed by
+    feature, kept apart from the counts so the count matrix stays numeric.
+    Both output layouts are written in row chunks straight from the sparse matrix.
+    """
+    def __init__(self, counts, feature_ids, sample_ids, taxonomy):
+        self.counts = counts
+        self.feature_ids = feature_ids
+        self.sample_ids = sample_ids
+        self.taxonomy = taxonomy
+
+    @classmethod
+    def from_exports(cls, otu_path, taxonomy_path, chunk_rows=CHUNK_ROWS):
+        """
+        Inner join of otu.csv and taxonomy.csv on the feature ID, in the order of
+        the OTU table (as pd.merge(otu, tax, how='inner')).
+        """
+        counts, feature_ids, sample_ids = read_counts(otu_path, chunk_rows)
+        return cls.join(counts, feature_ids, sample_ids, read_taxonomy_table(taxonomy_path))
+
+    @classmethod
+    def from_biom(cls, table_path, taxonomy_path=None):
+        """
+        The counts straight from a .biom (HDF5) file or a FeatureTable .qza,
+        joined with taxonomy_path (.qza / .tsv / .csv), or with the taxonomy
+        stored in the BIOM table itself when taxonomy_path is None.
+        """
+        from biom_reader import BiomTable
+
+        with BiomTable(table_path) as biom:
+            counts = as_integer_counts(biom.to_sparse())
+            tax = biom.taxonomy() if taxonomy_path is None else read_taxonomy_table(taxonomy_path)
+            if tax is None:
+                raise ValueError(f"{table_path} has no taxonomy metadata; pass the taxonomy .qza")
+            return cls.join(counts, biom.feature_ids, biom.sample_ids, tax)
+
+    @classmethod
+    def join(cls, counts, feature_ids, sample_ids, tax):
+        # Inner join on the feature ID, keeping the order of the count table
+        keep = feature_ids.isin(tax.index)
+        if not keep.all():
+            print(f"Dropping {(~keep).sum()} features without taxonomy")
+            counts, feature_ids = counts[keep], feature_ids[keep]
+        return cls(counts, feature_ids, sample_ids, tax.loc[feature_ids])
+
+    @classmethod
+    def load_npz(cls, path):
+        npz_path, features_path, samples_path = sparse_files(str(path))
+        features = read_taxonomy_table(features_path)
+        samples = pd.read_csv(samples_path, dtype=str)["ID"]
+        return cls(sparse.load_npz(npz_path).tocsr(), features.index, pd.Index(samples), features)
+
+    @classmethod
+    def load(cls, path, taxonomy_path=None):
+        """
+        A table saved as .npz, a .biom / .qza feature table, or the otu.csv +
+        taxonomy.csv exports.
+        """
+        if str(path).endswith(".npz"):
+            return cls.load_npz(path)
+        if str(path).endswith((".biom", ".qza")):
+            return cls.from_biom(path, taxonomy_path)
+        return cls.from_exports(path, taxonomy_path)
+
+    def save_npz(self, path):
+        """
+        CSR counts as <stem>.npz, the feature IDs with their taxonomy as
+        <stem>.features.csv and the sample IDs as <stem>.samples.csv.
+        """
+        npz_path, features_path, samples_path = sparse_files(str(path))
+        tmp_path = f"{npz_path}.{os.getpid()}.tmp.npz"
+        sparse.save_npz(tmp_path, self.counts)
+        os.replace(tmp_path, npz_path)
+        self.taxonomy.set_axis(self.feature_ids).to_csv(features_path)
+        pd.DataFrame({"ID": self.sample_ids}).to_csv(samples_path, index=False)
+        return npz_path
+
+    def to_mipmlp_frame(self):
+        """
+        The dense table MIPMLP.preprocess takes, as read from the CSV written by
+        write_mipmlp_input: an ID column, one column per feature and a last
+        'taxonomy' row. This is the only place the counts are made dense.
+        """
+        values = np.vstack([self.counts.T.toarray().astype(object), self.taxonomy["Taxon"].to_numpy(dtype=object)])
+        df = pd.DataFrame(values, columns=self.feature_ids.rename(None))
+        df.insert(0, "ID", list(self.sample_ids) + ["taxonomy"])
+        return df
+
+    @property
+    def shape(self):
+        return self.counts.shape
+
+    def _write_chunks(self, path, header, n_rows, rows, chunk_rows, footer=None):
+        # rows(start, stop) -> DataFrame of those output rows; written atomically
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", newline="") as f:
+            csv.writer(f, lineterminator="\n").writerow(header)
+            for start in range(0, n_rows, chunk_rows):
+                rows(start, min(start + chunk_rows, n_rows)).to_csv(f, header=False)
+            if footer is not None:
+                footer.to_csv(f, header=False)
+        os.replace(tmp_path, path)
+
+    def write_mipmlp_input(self, path, chunk_rows=CHUNK_ROWS):
+        """
+        The MIPMLP input layout: one row per sample (ID, then one column per
+        feature) and a last 'taxonomy' row with the lineage of every feature.
+        """
+        by_sample = self.counts.T.tocsr()
+        def rows(start, stop):
+            return pd.DataFrame(by_sample[start:stop].toarray(), index=self.sample_ids[start:stop])
+
+        taxonomy_row = pd.DataFrame([self.taxonomy["Taxon"].to_numpy()], index=["taxonomy"])
+        self._write_chunks(path, ["ID"] + list(self.feature_ids), self.shape[1], rows, chunk_rows, taxonomy_row)
+
+    def write_merged(self, path, chunk_rows=CHUNK_ROWS):
+        """
+        The merged layout: one row per feature (FeatureID, the sample counts,
+        then the taxonomy columns).
+        """
+        def rows(start, stop):
+            df = pd.DataFrame(self.counts[start:stop].toarray(), index=self.feature_ids[start:stop])
+            return pd.concat([df, self.taxonomy.iloc[start:stop].set_axis(df.index)], axis=1)
+
+        header = ["FeatureID"] + list(self.sample_ids) + list(self.taxonomy.columns)
+        self._write_chunks(path, header, self.shape[0], rows, chunk_rows)
@@ -1,20 +1,25 @@
-import pandas as pd
 from pathlib import Path
 
+from feature_table import FeatureTable
+
 base_path = Path("mouses_data/clean_fastq/exports")
 
+# otu_path can also be the QIIME2 table itself (table.qza / feature-table.biom, with
+# taxonomy_path = taxonomy.qza), or a sparse table saved as .npz (e.g.
+# final_merged_table.npz; taxonomy_path is then read from its .features.csv sidecar)
 otu_path = base_path / "otu.csv"
 taxonomy_path = base_path / "tax.tsv/taxonomy.csv"
 preprocess_path = "Union_tables_To_MIPMLP/for_preprocess.csv"
+sparse_path = "Union_tables_To_MIPMLP/for_preprocess.npz"
 
-otu = pd.read_csv(otu_path, index_col=0)
-tax = pd.read_csv(taxonomy_path, index_col=0)
-tax = tax.loc[otu.index]
-
-# Add taxonomy to OTU and transpose
-otu["taxonomy"] = tax["Taxon"]
+# Join OTU + taxonomy once (sparse counts, taxonomy kept apart)
+table = FeatureTable.load(otu_path, taxonomy_path)
+print(f"Joined table: {table.shape[0]} features x {table.shape[1]} samples")
 
-otu_t = otu.T
-otu_t.index.name = 'ID'
+# Samples as rows + a last 'taxonomy' row, written in chunks
+table.write_mipmlp_input(preprocess_path)
+print(f"Saved to {preprocess_path}")
 
-otu_t.to_csv(preprocess_path)
\ No newline at end of file
+# The same table in sparse form, for run_mipmlp_preprocessing.py
+table.save_npz(sparse_path)
+print(f"Saved to {sparse_path}")
@@ -0,0 +1,96 @@
+import pandas as pd
+
+# QIIME/Greengenes lineage ranks, in order: "k__Bacteria; p__Firmicutes; ...; s__gnavus".
+# SILVA and GTDB name the first rank domain ("d__Bacteria"); it is read as k
+RANKS = ["k", "p", "c", "o", "f", "g", "s"]
+RANK_NAMES = dict(zip(RANKS, ["Kingdom", "Phylum", "Class", "Order", "Family", "Genus", "Species"]))
+
+# Prefixes other than "<rank>__" that a rank is written with
+RANK_PREFIXES = {"k": "[kd]"}
+
+# One optional group per rank, in order. A rank missing from the lineage is NaN,
+# a rank present but empty ("s__") is ""
+LINEAGE_PATTERN = "^\\s*" + "".join(rf"(?:{RANK_PREFIXES.get(r, r)}__(?P<{r}>[^;]*?)\s*(?:;\s*|$))?"
+                                    for r in RANKS)
+# Lineages that are not ranks at all, and so are expected to parse to nothing
+UNPARSED_LINEAGES = ("Unassigned",)
+
+def find_taxonomy_column(columns):
+    """
+    מוצא את עמודת הטקסונומיה ('Taxon', 'Taxon_y', 'taxonomy', ...).
+    Falls back to the last column, as in the merged table the taxonomy is last.
+    """
+    matches = [col for col in columns if 'Taxon' in col or 'taxonomy' in col.lower()]
+    return matches[0] if matches else columns[-1]
+
+def read_taxonomy(path):
+    """
+    Reads only the ID and taxonomy columns of a merged table (the sample count
+    columns are never parsed). Returns (taxa Series indexed by ID, column name).
+    """
+    columns = pd.read_csv(path, nrows=0).columns
+    tax_col = find_taxonomy_column(columns)
+    df = pd.read_csv(path, usecols=[columns[0], tax_col], index_col=0)
+    return df[tax_col], tax_col
+
+def parse_lineages(taxa):
+    """
+    מפרק כל lineage פעם אחת.
+    Returns a DataFrame with the index of taxa and one categorical column per
+    rank (k ... s). The regex runs once per distinct lineage, not per row.
+    Lineages the pattern does not fully match (other rank prefixes, ranks out
+    of order) are counted and reported, as their ranks would be silently lost.
+    """
+    taxa = taxa.astype("category")
+    categories = pd.Series(taxa.cat.categories, dtype=object)
+    distinct = categories.str.extract(LINEAGE_PATTERN)
+    unmatched = ~categories.str.fullmatch(LINEAGE_PATTERN + r"\s*") & ~categories.isin(UNPARSED_LINEAGES)
+    if unmatched.any():
+        n_rows = taxa.isin(categories[unmatched]).sum()
+        print(f"Warning: {unmatched.sum()} lineages ({n_rows} rows) did not fully match the rank pattern, "
+              f"e.g. {categories[unmatched].iloc[0]!r}")
+    distinct = distinct[RANKS].astype("category")
+    # Code -1 (missing lineage) is not in the index, so its row is all NaN
+    frame = distinct.reindex(taxa.cat.codes.to_numpy())
+    frame.index = taxa.index
+    return frame
+
+def is_assigned(frame, rank, unassigned=("Unassigned",)):
+    """
+    True where the rank has a name that is neither empty nor one of unassigned.
+    """
+    names = frame[rank]
+    return names.notna() & (names != "") & ~names.isin(list(unassigned))
+
+def lineage_counts(frame, rank=None, mask=None):
+    """
+    Number of rows per distinct lineage from the kingdom down to rank (default:
+    the full lineage, where "g__X; s__" and "g__X" are different), most common
+    first. Indexed by the lineage written back as "k__...; p__...; ...".
+    """
+    ranks = RANKS if rank is None else RANKS[:RANKS.index(rank) + 1]
+    if mask is not None:
+        frame = frame[mask]
+    counts = frame.groupby(ranks, observed=True, dropna=False, sort=False).size()
+    counts = counts.sort_values(ascending=False, kind="stable")
+    counts.index = ["; ".join(f"{r}__{name}" for r, name in zip(ranks, key) if not pd.isna(name))
+                    for key in counts.index]
+    counts.index.name = "lineage"
+    return counts.rename("count")
+
+def level_coverage(frame, unassigned=("Unassigned",)):
+    """
+    Per rank: the number and share of rows with an assigned name, and the number
+    of distinct names and lineages among them.
+    unassigned: names that do not count as assigned, either for every rank or
+    as {rank: names} (ranks left out use ("Unassigned",)).
+    """
+    rows = []
+    for rank in RANKS:
+        names = unassigned.get(rank, ("Unassigned",)) if isinstance(unassigned, dict) else unassigned
+        assigned = is_assigned(frame, rank, names)
+        rows.append({"rank": RANK_NAMES[rank], "assigned": int(assigned.sum()),
+                     "percent": 100 * assigned.mean() if len(frame) else 0.0,
+                     "unique_names": frame.loc[assigned, rank].nunique(),
+                     "unique_lineages": len(lineage_counts(frame, rank, assigned))})
+    return pd.DataFrame(rows)
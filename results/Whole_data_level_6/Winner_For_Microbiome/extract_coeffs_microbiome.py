@@ -1,12 +1,16 @@
 import warnings
 import pandas as pd
 import numpy as np
-import re
 import os
-from scipy.stats import spearmanr
+import sys
 from sklearn.linear_model import Ridge
 from sklearn.preprocessing import StandardScaler
 
+# Shared loading / column cleaning from Ratio_model/src
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "Ratio_model"))
+from src.data_loader import load_clean_csv, load_column_mapping
+from src.feature_ranking import spearman_correlations
+
 # --- 1. Settings ---
 warnings.filterwarnings("ignore")
 
@@ -21,13 +25,11 @@ DATA_FILE = "data_level6_uncensored.csv"
 print(f"--- Starting Microbiome Coefficient Extraction (Whole Data Level 6, Top {NUM_FEATURES}) ---")
 
 # --- 2. Load Data ---
-uncensored = pd.read_csv(os.path.join(base_path, DATA_FILE), index_col=0)
-
-# Clean Column Names
-def clean_col_name(name):
-    return re.sub(r'[^a-zA-Z0-9_]', '_', str(name))
+data_path = os.path.join(base_path, DATA_FILE)
+uncensored = load_clean_csv(data_path)
 
-uncensored.columns = [clean_col_name(c) for c in uncensored.columns]
+# Clean name -> original column name, for the report
+original_names = load_column_mapping(data_path).set_index("Clean")["Original"]
 
 # --- 3. Prepare X and y ---
 X_train_raw = uncensored.copy()
@@ -41,17 +43,10 @@ y_train = X_train_raw["diff"]
 print(f"Data Loaded: {X_train.shape[0]} samples")
 
 # --- 4. Feature Selection (Spearman) ---
-correlations = []
-for col in X_train.columns:
-    try:
-        x_col = X_train[col].astype(float)
-        coef, p = spearmanr(x_col, y_train)
-        if not np.isnan(coef):
-            correlations.append((col, abs(coef), coef)) 
-    except:
-        pass
-
-corr_df = pd.DataFrame(correlations, columns=["Feature", "Abs_Corr", "Real_Corr"])
+# All columns in one vectorized pass; undefined correlations (NaN) are dropped
+spearman = spearman_correlations(X_train, y_train).dropna(subset=["coef"])
+corr_df = pd.DataFrame({"Feature": spearman.index, "Abs_Corr": spearman["coef"].abs().values,
+                        "Real_Corr": spearman["coef"].values, "P_Value": spearman["p_value"].values})
 top_features_df = corr_df.sort_values(by="Abs_Corr", ascending=False).head(NUM_FEATURES)
 top_feature_names = top_features_df["Feature"].tolist()
 
@@ -81,7 +76,10 @@ for name, coeff in zip(top_feature_names, ridge.coef_):
         
     results.append({
         "Bacteria": name,
+        "Original_Name": original_names.get(name, name),
         "Ridge_Coefficient": coeff,
+        "Spearman_Corr": spearman.at[name, "coef"],
+        "Spearman_P": spearman.at[name, "p_value"],
         "Direction": direction,
         "Interpretation": meaning
     })
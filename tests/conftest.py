@@ -0,0 +1,16 @@
+import os
+import sys
+
+# Each part of the repo is run from its own folder, with its own import root
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("Ratio_model", "Union_tables_To_MIPMLP", "MIPMLP_scripts"):
+    sys.path.insert(0, os.path.join(repo_dir, folder))
+
+try:
+    import LBL  # noqa: F401
+except ImportError:
+    # src.pipeline imports the LBL model at module level; the tests that fit
+    # folds replace it with their own model
+    import types
+    sys.modules["LBL"] = types.ModuleType("LBL")
+    sys.modules["LBL"].LBL = None
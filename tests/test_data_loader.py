@@ -0,0 +1,80 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import data_loader
+
+def write_csv(path, n_rows=6, n_cols=150):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(n_rows, n_cols)), columns=[f"taxon {i}" for i in range(n_cols)],
+                      index=[f"{i % 3 + 1}-{i}" for i in range(n_rows)])
+    df["Age (weeks)"] = [4, 8] * (n_rows // 2)
+    df["diff"] = rng.normal(size=n_rows)
+    df.iloc[0, -1] = np.nan
+    df.to_csv(path)
+    return path
+
+def test_cache_version_is_part_of_the_cache_key(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    path = str(write_csv(tmp_path / "data.csv"))
+    data_loader.load_clean_csv(path)
+    old_cache = data_loader._cache_path(path, False)[2]
+
+    monkeypatch.setattr(data_loader, "CACHE_VERSION", data_loader.CACHE_VERSION + 1)
+    new_cache = data_loader._cache_path(path, False)[2]
+    assert new_cache != old_cache
+    data_loader.load_clean_csv(path)
+    # The cache of the older version is removed, not read
+    assert (tmp_path / data_loader.CACHE_DIRNAME / new_cache.rsplit("/", 1)[1]).exists()
+    assert not (tmp_path / data_loader.CACHE_DIRNAME / old_cache.rsplit("/", 1)[1]).exists()
+
+def test_adding_cage_does_not_fragment_a_wide_frame(tmp_path):
+    path = str(write_csv(tmp_path / "data.csv"))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", pd.errors.PerformanceWarning)
+        df = data_loader.load_clean_csv(path, use_cache=False)
+    assert list(df["Cage"].unique()) == ["1", "2", "3"]
+
+def test_partition_by_age_without_age_column():
+    censored = pd.DataFrame({"x": [1.0, 2.0], "Cage": ["1", "2"]})
+    uncensored = pd.DataFrame({"x": [3.0, 4.0, 5.0], "Cage": ["1", "2", "3"]})
+    partitions = data_loader.partition_by_age(censored, uncensored, [None])
+    assert list(partitions) == [None]
+    assert partitions[None][0] is censored and partitions[None][1] is uncensored
+
+def test_partition_by_age_keeps_missing_ages_empty():
+    censored = pd.DataFrame({"x": [1.0, 2.0], "Age": [4, 8]})
+    uncensored = pd.DataFrame({"x": [3.0, 4.0, 5.0], "Age": [4, 4, 8]})
+    partitions = data_loader.partition_by_age(censored, uncensored, [4, 12, None])
+    assert [len(df) for df in partitions[4]] == [1, 2]
+    assert [len(df) for df in partitions[12]] == [0, 0]
+    assert partitions[None][0] is censored and partitions[None][1] is uncensored
+
+@pytest.mark.parametrize("drop_nan_target", [False, True])
+@pytest.mark.parametrize("index", [[101, 102, 203, 204, 305, 306], [f"{i}-m{i}" for i in range(6)]])
+def test_warm_cache_matches_csv(tmp_path, index, drop_nan_target):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "data.csv"
+    df = pd.read_csv(write_csv(path), index_col=0)
+    df.index = index
+    df.to_csv(path)
+
+    cold = data_loader.load_clean_csv(str(path), drop_nan_target, use_cache=False)
+    data_loader.load_clean_csv(str(path), drop_nan_target)
+    warm = data_loader.load_clean_csv(str(path), drop_nan_target)
+    pd.testing.assert_frame_equal(warm, cold)
+
+def test_warm_cache_restores_dtypes_changed_by_feather(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(write_csv(tmp_path / "data.csv"))
+    cold = data_loader.load_clean_csv(path, use_cache=False)
+    data_loader.load_clean_csv(path)
+
+    # A cache file whose integer-like columns came back as strings
+    cache_path = data_loader._cache_path(path, False)[2]
+    stored = pd.read_feather(cache_path)
+    stored.astype({stored.columns[0]: str, "Age__weeks_": str}).to_feather(cache_path)
+
+    pd.testing.assert_frame_equal(data_loader.load_clean_csv(path), cold)
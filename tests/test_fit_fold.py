@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from src import pipeline
+
+TARGET = "diff"
+FEATURES = [f"f{i}" for i in range(8)]
+
+class EditingLBL:
+    """
+    A model that edits its inputs in place (new values, loc assignment,
+    inplace drop / fillna), as LBL may.
+    """
+    def __init__(self, **params):
+        self.target = params["tag_column"]
+
+    def fit(self, train, censored):
+        train[self.target] = train[self.target] - train[self.target].mean()
+        train.loc[:, FEATURES] = train[FEATURES] * 2
+        censored.drop(columns=[FEATURES[0]], inplace=True)
+        censored.fillna(0, inplace=True)
+        self.weights = train[FEATURES].T @ train[self.target] / len(train) + censored[FEATURES[1:]].mean().sum()
+
+    def predict(self, test):
+        test.loc[:, FEATURES] = test[FEATURES] + 1
+        return (test[FEATURES] @ self.weights).to_numpy()
+
+def make_data(seed=0):
+    rng = np.random.default_rng(seed)
+    def frame(n, cages):
+        df = pd.DataFrame(rng.normal(size=(n, len(FEATURES))), columns=FEATURES,
+                          index=[f"s{seed}_{cages}_{i}" for i in range(n)])
+        df[TARGET] = rng.normal(100, 20, n)
+        df["Cage"] = rng.choice(cages, n)
+        return df
+    uncensored = frame(24, ["1", "2", "3", "4"])
+    censored = frame(10, ["5", "6"])
+    censored.iloc[::3, 2] = np.nan
+    return censored, uncensored
+
+def baseline_fit_fold(lbl_params, train, test, censored, target_col):
+    # The previous path: deep copies of every frame before the fit
+    train, test, censored = train.copy(), test.copy(), censored.copy()
+    fold_res = test[[target_col]].copy()
+    lbl = EditingLBL(**lbl_params)
+    lbl.fit(train, censored)
+    fold_res["predicted_score"] = lbl.predict(test)
+    fold_res["Cage"] = test["Cage"].iloc[0]
+    return fold_res
+
+def test_fit_fold_matches_copy_path_and_leaves_inputs_alone(monkeypatch):
+    monkeypatch.setattr(pipeline, "LBL", EditingLBL)
+    censored, uncensored = make_data()
+    censored_before, uncensored_before = censored.copy(), uncensored.copy()
+    lbl_params = {"tag_column": TARGET}
+
+    for train, test in pipeline.iter_logo_folds(uncensored):
+        expected = baseline_fit_fold(lbl_params, train, test, censored, TARGET)
+        _, fold_res, error, _ = pipeline.fit_fold(lbl_params, train, test, censored, TARGET)
+        assert error is None, error
+        pd.testing.assert_frame_equal(fold_res, expected)
+
+    pd.testing.assert_frame_equal(censored, censored_before)
+    pd.testing.assert_frame_equal(uncensored, uncensored_before)
+
+def test_copy_on_write_is_scoped_to_the_fit():
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return
+    with pipeline.copy_on_write():
+        assert pd.get_option("mode.copy_on_write")
+    assert not pd.get_option("mode.copy_on_write")
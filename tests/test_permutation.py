@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import pipeline
+from src.evaluation import calculate_concordance_index
+from src.permutation import permuted_c_index
+
+N_FEATURES = 6
+
+class FirstKLBL:
+    """Least squares on the first feature_selection features."""
+    def __init__(self, **params):
+        self.target = params["tag_column"]
+        self.k = params["feature_selection"]
+        self.n = params["num_of_bact"]
+
+    def fit(self, train, censored):
+        X = train.iloc[:, :self.n].iloc[:, :self.k].to_numpy()
+        self.coef = np.linalg.lstsq(np.c_[np.ones(len(X)), X], train[self.target].to_numpy(), rcond=None)[0]
+
+    def predict(self, test):
+        X = test.iloc[:, :self.n].iloc[:, :self.k].to_numpy()
+        return np.c_[np.ones(len(X)), X] @ self.coef
+
+def make_params(**extra):
+    params = {"target_col": "diff", "id_col": "ID", "age_col": "Age", "num_of_bact": N_FEATURES,
+              "with_microbiome": True, "augmented_censored": False, "gamma": 1.0,
+              "only_microbiome": True, "alpha": 1.0}
+    params.update(extra)
+    return params
+
+def make_data():
+    rng = np.random.default_rng(3)
+    def frame(n, n_cages):
+        df = pd.DataFrame(rng.normal(size=(n, N_FEATURES)), columns=[f"f{i}" for i in range(N_FEATURES)])
+        df["diff"] = df["f0"] * 3 + rng.normal(size=n)
+        df["Cage"] = [str(i % n_cages) for i in range(n)]
+        return df
+    return frame(6, 2), frame(30, 5)
+
+def per_k_c_index(censored, uncensored, params, k_values, seed_seq):
+    # The previous path: one full LOGO run per k on the same shuffled target
+    shuffled = uncensored.copy()
+    shuffled["diff"] = np.random.default_rng(seed_seq).permutation(shuffled["diff"].to_numpy())
+    scores = {}
+    for k in k_values:
+        results_df = pipeline.run_logo_cv(censored, shuffled, params, k)
+        scores[k] = calculate_concordance_index(results_df["diff"].values, results_df["predicted_score"].values)
+    return scores
+
+@pytest.mark.parametrize("extra", [{}, {"feature_ranking": "spearman"}, {"cv_backend": "ridge_gram"}])
+def test_grid_matches_one_run_per_k(monkeypatch, extra):
+    monkeypatch.setattr(pipeline, "LBL", FirstKLBL)
+    censored, uncensored = make_data()
+    params = make_params(**extra)
+    seed_seq = np.random.SeedSequence(7).spawn(1)[0]
+
+    expected = per_k_c_index(censored, uncensored, params, [1, 3, 6], seed_seq)
+    assert permuted_c_index(censored, uncensored, params, [1, 3, 6], seed_seq, 0) == pytest.approx(expected)
+
+def test_fold_timings_are_tagged_with_the_permutation(monkeypatch):
+    monkeypatch.setattr(pipeline, "LBL", FirstKLBL)
+    records = []
+    monkeypatch.setattr(pipeline, "log_fold_timing", lambda **record: records.append(record))
+    censored, uncensored = make_data()
+
+    permuted_c_index(censored, uncensored, make_params(), [1, 2], np.random.SeedSequence(0), 4)
+    assert len(records) == 2 * 5
+    assert all(record["permutation"] == 4 for record in records)
@@ -0,0 +1,31 @@
+import os
+import signal
+
+import run_mipmlp_preprocessing as driver
+
+def ok_result(table, level, params, out_path, key):
+    return level, (1, 1), 0.0, 0.0, 0.0, None
+
+def exit_on_level_6(table, level, params, out_path, key):
+    # As if MIPMLP called os._exit(0) / sys.exit(0) before returning
+    if level == 6:
+        os._exit(0)
+    return ok_result(table, level, params, out_path, key)
+
+def run(worker, levels, n_jobs):
+    signal.alarm(120)  # fail instead of hanging
+    try:
+        return {r[0]: r for r in driver.run_levels(None, [(l, None, None) for l in levels], n_jobs, worker=worker)}
+    finally:
+        signal.alarm(0)
+
+def test_all_levels_return():
+    results = run(ok_result, [7, 6, 5], n_jobs=2)
+    assert sorted(results) == [5, 6, 7]
+    assert all(r[5] is None for r in results.values())
+
+def test_worker_exiting_0_without_result_is_an_error():
+    results = run(exit_on_level_6, [7, 6, 5], n_jobs=2)
+    assert sorted(results) == [5, 6, 7]
+    assert results[7][5] is None and results[5][5] is None
+    assert "exited with code 0 without a result" in results[6][5]
@@ -0,0 +1,20 @@
+import numpy as np
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import StandardScaler
+
+from src.stability import standardized_ridge
+
+def test_matches_scaler_and_ridge():
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(20, 4)), rng.normal(size=20)
+    expected = Ridge(alpha=2.0).fit(StandardScaler().fit_transform(X), y).coef_
+    np.testing.assert_allclose(standardized_ridge(X, y, 2.0), expected)
+
+def test_singular_system_without_penalty():
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=15)
+    # A constant column and a duplicated column make Z'Z singular at alpha 0
+    X = np.c_[x, x, np.ones(15)]
+    coefs = standardized_ridge(X, 2 * x + 1, 0.0)
+    assert np.all(np.isfinite(coefs))
+    np.testing.assert_allclose(coefs, [x.std(), x.std(), 0.0], atol=1e-8)
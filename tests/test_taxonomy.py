@@ -0,0 +1,26 @@
+import pandas as pd
+
+from taxonomy import level_coverage, parse_lineages
+
+def test_domain_prefix_is_read_as_kingdom(capsys):
+    taxa = pd.Series(["d__Bacteria; p__Firmicutes; c__Clostridia; o__Lachnospirales; "
+                      "f__Lachnospiraceae; g__Blautia; s__",
+                      "k__Bacteria; p__Bacteroidota",
+                      "Unassigned"], index=["a", "b", "c"])
+    frame = parse_lineages(taxa)
+
+    assert frame.loc["a", "k"] == "Bacteria"
+    assert frame.loc["a", "g"] == "Blautia"
+    assert frame.loc["a", "s"] == ""
+    assert frame.loc["b", "k"] == "Bacteria"
+    assert frame.loc["c"].isna().all()
+    assert level_coverage(frame)["assigned"].tolist() == [2, 2, 1, 1, 1, 1, 0]
+    assert "Warning" not in capsys.readouterr().out
+
+def test_unmatched_lineages_are_reported(capsys):
+    taxa = pd.Series(["D_0__Bacteria;D_1__Firmicutes", "k__Bacteria; p__Firmicutes", "D_0__Bacteria;D_1__Firmicutes"])
+    frame = parse_lineages(taxa)
+
+    assert frame["k"].isna().tolist() == [True, False, True]
+    out = capsys.readouterr().out
+    assert "1 lineages (2 rows) did not fully match" in out